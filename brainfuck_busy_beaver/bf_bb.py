@@ -1,52 +1,119 @@
 import argparse
+import collections
+import concurrent.futures
+import os
 import time
 
 import bf_enum
 import bf_sim
 
 
-def sim_all(size, steps_cutoff, *,
-            print_steps, progress_interval):
-  start_time = time.time()
-  num_total = 0
-  num_unk = 0
-  num_halt = 0
-  total_steps = 0
-  halt_steps = 0
+class SimStats:
+  """Summary stats from simulating a collection of BF programs."""
+  def __init__(self):
+    self.num_total = 0
+    self.num_halt = 0
+    self.total_steps = 0
+    self.halt_steps = 0
+    self.max_steps = -1
+    self.best_steps_prog = None
+    self.max_score = -1
+    self.best_score_prog = None
+    # (num_steps, score, prog) for halting programs above print_steps.
+    self.long_halters = []
+    self.last_prog = None
+
+def sim_one(prog, steps_cutoff):
+  """Returns (prog, num_steps, is_running, score)."""
+  sim = bf_sim.BFSim(prog)
+  sim.run(steps_cutoff)
+  if sim.is_running():
+    return prog, sim.num_steps, True, None
+  return prog, sim.num_steps, False, sim.score()
 
-  max_steps = -1
-  best_steps_prog = None
-  max_score = -1
-  best_score_prog = None
-  for prog in bf_enum.bf_enum_opt(size):
-    if progress_interval and num_total % progress_interval == 0:
-      print(f"... {num_total:11_d} BFs simulated. Current: {prog}  ({time.time() - start_time:_.0f}s)")
-    sim = bf_sim.BFSim(prog)
-    sim.run(steps_cutoff)
-    num_total += 1
-    total_steps += sim.num_steps
-    if sim.is_running():
-      num_unk += 1
-    else:
+def sim_chunk(progs, steps_cutoff, print_steps):
+  """Simulate a list of programs. Module level so it can run in a worker."""
+  stats = SimStats()
+  if bf_sim.np is not None and not bf_sim.numba:
+    # Without numba, simulating the whole chunk in lockstep is faster.
+    num_steps, running, score = bf_sim.run_batch(progs, steps_cutoff)
+    results = zip(progs, num_steps.tolist(), running.tolist(), score.tolist())
+  else:
+    results = (sim_one(prog, steps_cutoff) for prog in progs)
+  for prog, num_steps, running, score in results:
+    stats.num_total += 1
+    stats.total_steps += num_steps
+    if not running:
       # Halted
-      num_halt += 1
-      halt_steps += sim.num_steps
-      if sim.num_steps > max_steps:
-        print("+++ New Best Steps:", sim.num_steps, prog)
-        max_steps = sim.num_steps
-        best_steps_prog = prog
-      if sim.score() > max_score:
-        print("*** New Best Score:", sim.score(), prog)
-        max_score = sim.score()
-        best_score_prog = prog
-      if sim.num_steps > print_steps:
-        print("  xxx  ", sim.num_steps, sim.score(), prog)
+      stats.num_halt += 1
+      stats.halt_steps += num_steps
+      if num_steps > stats.max_steps:
+        stats.max_steps = num_steps
+        stats.best_steps_prog = prog
+      if score > stats.max_score:
+        stats.max_score = score
+        stats.best_score_prog = prog
+      if num_steps > print_steps:
+        stats.long_halters.append((num_steps, score, prog))
+  stats.last_prog = prog
+  return stats
+
+def chunked(xs, chunk_size):
+  chunk = []
+  for x in xs:
+    chunk.append(x)
+    if len(chunk) >= chunk_size:
+      yield chunk
+      chunk = []
+  if chunk:
+    yield chunk
+
+def sim_all(size, steps_cutoff, *,
+            print_steps, progress_interval, num_procs=None, chunk_size=10_000):
+  start_time = time.perf_counter()
+  total = SimStats()
+
+  def merge(stats):
+    if (progress_interval and
+        (total.num_total + stats.num_total) // progress_interval >
+        total.num_total // progress_interval):
+      print(f"... {total.num_total + stats.num_total:11_d} BFs simulated. Current: {stats.last_prog}  ({time.perf_counter() - start_time:_.0f}s)")
+    total.num_total += stats.num_total
+    total.num_halt += stats.num_halt
+    total.total_steps += stats.total_steps
+    total.halt_steps += stats.halt_steps
+    if stats.max_steps > total.max_steps:
+      print("+++ New Best Steps:", stats.max_steps, stats.best_steps_prog)
+      total.max_steps = stats.max_steps
+      total.best_steps_prog = stats.best_steps_prog
+    if stats.max_score > total.max_score:
+      print("*** New Best Score:", stats.max_score, stats.best_score_prog)
+      total.max_score = stats.max_score
+      total.best_score_prog = stats.best_score_prog
+    for num_steps, score, prog in stats.long_halters:
+      print("  xxx  ", num_steps, score, prog)
+
+  # Programs are independent, so simulate chunks of them in parallel. Only
+  # keep a few chunks in flight at a time so that we don't enumerate all
+  # programs up front.
+  num_procs = num_procs or os.cpu_count()
+  with concurrent.futures.ProcessPoolExecutor(num_procs) as executor:
+    pending = collections.deque()
+    progs = bf_enum.bf_enum_opt(size, prefix="+")
+    for chunk in chunked(progs, chunk_size):
+      pending.append(executor.submit(sim_chunk, chunk, steps_cutoff,
+                                     print_steps))
+      if len(pending) > 2 * num_procs:
+        merge(pending.popleft().result())
+    while pending:
+      merge(pending.popleft().result())
 
-  print(f"Simulated {num_total:_} BFs of size {size} for {steps_cutoff:_} steps:")
-  print(f" * Total steps: {total_steps:_} ({total_steps / (time.time() - start_time):_.0f} steps / s)")
-  print(f" * Halted {num_halt:_} / {num_total:_} = {num_halt/num_total:.1%}")
-  print(f" * Max score: {max_score:_} {best_score_prog}")
-  print(f" * Steps: Max: {max_steps:_} {best_steps_prog}  (Mean: {halt_steps / num_halt:_.0f})")
+  elapsed = time.perf_counter() - start_time
+  print(f"Simulated {total.num_total:_} BFs of size {size} for {steps_cutoff:_} steps:")
+  print(f" * Total steps: {total.total_steps:_} ({total.total_steps / elapsed:_.0f} steps / s)")
+  print(f" * Halted {total.num_halt:_} / {total.num_total:_} = {total.num_halt/total.num_total:.1%}")
+  print(f" * Max score: {total.max_score:_} {total.best_score_prog}")
+  print(f" * Steps: Max: {total.max_steps:_} {total.best_steps_prog}  (Mean: {total.halt_steps / total.num_halt:_.0f})")
 
 
 def main():
@@ -58,11 +125,14 @@ def main():
   parser.add_argument("--progress-interval", "--progress", "-p",
                       type=int, default=0,
                       help="Print progress at this interval (0 means never).")
+  parser.add_argument("--num-procs", "-n", type=int,
+                      help="Number of worker processes (default: # CPUs).")
   args = parser.parse_args()
 
   sim_all(args.size, args.steps_cutoff,
           print_steps = args.print_steps,
-          progress_interval = args.progress_interval)
+          progress_interval = args.progress_interval,
+          num_procs = args.num_procs)
 
 if __name__ == "__main__":
   main()
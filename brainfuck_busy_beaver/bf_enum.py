@@ -1,22 +1,50 @@
 import argparse
+import functools
 
 
+# Programs from bf_enum are packed into ints using 3 bits per instruction
+# (first instruction in the most significant bits).
+kInstrs = "+-><[]"
+kInstrCode = {instr: code for code, instr in enumerate(kInstrs)}
+
+def decode(size, packed):
+  """Convert a packed program (see bf_enum) of size `size` back to a str."""
+  return "".join(kInstrs[(packed >> (3 * (size - 1 - i))) & 0b111]
+                 for i in range(size))
+
+@functools.cache
 def bf_enum(size):
-  """Enumerate all BF programs of size `size`."""
+  """List all BF programs of size `size` (packed as ints, see decode).
+
+  Cached, so each smaller size is only enumerated once (rather than once per
+  use as a prefix or loop body)."""
   if size == 0:
-    yield ""
-  else:
-    # First enumerate all programs that end in a non-] instruction.
-    for prefix in bf_enum(size - 1):
-      for i in "+-><":
-        yield prefix + i
-    # Second enumerate all programs which end in a [] loop.
-    if size >= 2:
-      for loop_len in range((size - 2) + 1):
-        prefix_len = size - 2 - loop_len
-        for prefix in bf_enum(prefix_len):
-          for loop in bf_enum(loop_len):
-            yield prefix + "[" + loop + "]"
+    return (0,)
+  progs = []
+  # First enumerate all programs that end in a non-] instruction.
+  for prefix in bf_enum(size - 1):
+    for i in "+-><":
+      progs.append((prefix << 3) | kInstrCode[i])
+  # Second enumerate all programs which end in a [] loop.
+  for loop_len in range((size - 2) + 1):
+    prefix_len = size - 2 - loop_len
+    prefix_shift = 3 * (loop_len + 2)
+    loop_start = kInstrCode["["] << (3 * (loop_len + 1))
+    for prefix in bf_enum(prefix_len):
+      prefix_bits = (prefix << prefix_shift) | loop_start | kInstrCode["]"]
+      for loop in bf_enum(loop_len):
+        progs.append(prefix_bits | (loop << 3))
+  return tuple(progs)
+
+def bf_count(size):
+  """Number of BF programs of size `size` (without enumerating them)."""
+  # Same recursion as bf_enum, computed bottom up.
+  counts = [1]
+  for n in range(1, size + 1):
+    counts.append(4 * counts[n - 1] +
+                  sum(counts[n - 2 - loop_len] * counts[loop_len]
+                      for loop_len in range(n - 1)))
+  return counts[size]
 
 # Optimization: Don't allow wasted pairs of instructinos:
 kExcludePairs = {
@@ -26,60 +54,139 @@ kExcludePairs = {
   "<" : frozenset(">-"),  # No <> or <-
   "]" : frozenset("-"),    # No ]-
 }
-def simple_instr_opt(prev):
-  next = set("+-><")
-  if prev and prev[-1] in kExcludePairs:
-    next.difference_update(kExcludePairs[prev[-1]])
-  return next
-
-def _bf_enum_opt_help(size, *, allow_end_loop=True, only_end_loop=False):
-  """Optimized version of bf_enum, avoids certain unhelpful patterns."""
-  if size == 0:
-    yield ""
-  else:
-    # First enumerate all programs which end in a [] loop.
-    if size >= 2 and allow_end_loop:
-      # Optimization: Don't allow trivial loops (they never halt).
-      max_loop_len = size - 2
-      for loop_len in reversed(range(1, max_loop_len + 1)):
-        prefix_len = size - 2 - loop_len
-        # Optimization: Do not allow ][. Second loop will never run!
-        for prefix in _bf_enum_opt_help(prefix_len, allow_end_loop = False):
-          # Optimization: Do not allow ]]. If the inner loop ever runs, the
-          # outer one will exit immediately, so the outer loop is pointless.
-          for loop in _bf_enum_opt_help(loop_len, allow_end_loop = False):
-            yield prefix + "[" + loop + "]"
-    if not only_end_loop:
-      # Second enumerate all programs that end in simple (non-]) instruction.
-      for prefix in _bf_enum_opt_help(size - 1):
-        for i in simple_instr_opt(prefix):
-          yield prefix + i
-
-def is_dir_norm(prog):
-  """Return true if program does not have a < before a >"""
-  r = prog.find(">")
-  l = prog.find("<")
-  if l == -1:
-    # No < : Good
+kSimpleInstrs = b"+-><"
+kRight = ord(">")
+kLeft = ord("<")
+kLoopStart = ord("[")
+kLoopEnd = ord("]")
+
+# Simple instructions allowed to follow each instruction, indexed by byte
+# value (index 0 is used for the start of a program).
+kNextSimpleInstrs = [kSimpleInstrs] * 256
+for prev, excluded in kExcludePairs.items():
+  kNextSimpleInstrs[ord(prev)] = bytes(i for i in kSimpleInstrs
+                                       if chr(i) not in excluded)
+
+def _can_finish(last, depth, remaining, only_end_loop):
+  """Can a partial program (with `depth` open loops, ending in instruction
+  byte `last`) be completed with exactly `remaining` more instructions?"""
+  if depth == 0:
+    if remaining == 0:
+      return last == kLoopEnd or not only_end_loop
+    if only_end_loop:
+      # Need another loop at the end. No ][, so after ] we need an extra
+      # simple instruction before the loop.
+      return remaining >= (4 if last == kLoopEnd else 3)
     return True
-  if r == -1:
-    # Has < but no > : Bad
-    return False
-  # Has both < and > : Does > come first?
-  return r < l
+  # Must close all open loops. No [] or ]], so every ] follows a simple instr.
+  if last in kSimpleInstrs:
+    return remaining >= 2 * depth - 1
+  return remaining >= 2 * depth
+
+@functools.cache
+def _next_instrs(last, depth, remaining, only_end_loop, allow_left):
+  """All instructions which can come next and still lead to a full program.
+
+  Depends only on the local state, not on the rest of the program, so it is
+  shared across every node with this state and across bf_enum_opt calls."""
+  next = [i for i in kNextSimpleInstrs[last]
+          if (allow_left or i != kLeft) and
+             _can_finish(i, depth, remaining - 1, only_end_loop)]
+  # Optimization: Do not allow ][. Second loop will never run!
+  if (last != kLoopEnd and
+      _can_finish(kLoopStart, depth + 1, remaining - 1, only_end_loop)):
+    next.append(kLoopStart)
+  # Optimization: Don't allow trivial loops (they never halt).
+  # Optimization: Do not allow ]]. If the inner loop ever runs, the
+  # outer one will exit immediately, so the outer loop is pointless.
+  if (depth > 0 and last in kSimpleInstrs and
+      _can_finish(kLoopEnd, depth - 1, remaining - 1, only_end_loop)):
+    next.append(kLoopEnd)
+  return bytes(next)
+
+def _bf_enum_opt_help(size, *, prefix="", only_end_loop=False,
+                      dir_norm=False):
+  """Optimized version of bf_enum, avoids certain unhelpful patterns.
+
+  Programs are built left to right in a single shared buffer using an explicit
+  stack of choices (instead of recursive generators concatenating strings).
+  If `dir_norm`, only yield programs which do not have a < before a >."""
+  depth = prefix.count("[") - prefix.count("]")
+  last = ord(prefix[-1]) if prefix else 0
+  allow_left = not dir_norm or ">" in prefix
+  if size == len(prefix):
+    if _can_finish(last, depth, 0, only_end_loop):
+      yield prefix
+    return
+
+  # Stack frames are (position, loop depth after instr, whether < is allowed
+  # after instr, instr) for each choice still to be explored. The frames for
+  # all choices from a given state are always the same, so we only build them
+  # once.
+  choices = {}
+  def make_choices(pos, depth, allow_left, last):
+    return tuple(
+      (pos, depth + (instr == kLoopStart) - (instr == kLoopEnd),
+       allow_left or instr == kRight, instr)
+      for instr in reversed(_next_instrs(last, depth, size - pos,
+                                         only_end_loop, allow_left)))
+
+  buf = bytearray(prefix, "ascii") + bytearray(size - len(prefix))
+  stack = list(make_choices(len(prefix), depth, allow_left, last))
+  while stack:
+    pos, depth, allow_left, instr = stack.pop()
+    buf[pos] = instr
+    pos += 1
+    if pos == size:
+      yield buf.decode()
+    else:
+      key = (pos, depth, allow_left, instr)
+      next = choices.get(key)
+      if next is None:
+        next = choices[key] = make_choices(pos, depth, allow_left, instr)
+      stack.extend(next)
+
+@functools.cache
+def _count_opt_help(last, depth, remaining, only_end_loop, allow_left):
+  """Number of ways _bf_enum_opt_help can complete a partial program."""
+  if remaining == 0:
+    return 1
+  count = 0
+  for instr in _next_instrs(last, depth, remaining, only_end_loop, allow_left):
+    count += _count_opt_help(
+      instr, depth + (instr == kLoopStart) - (instr == kLoopEnd),
+      remaining - 1, only_end_loop, allow_left or instr == kRight)
+  return count
+
+def bf_count_opt(size, prefix="+"):
+  """Number of programs bf_enum_opt would yield (without enumerating them)."""
+  if size < 4:
+    return 0
+  depth = prefix.count("[") - prefix.count("]")
+  last = ord(prefix[-1]) if prefix else 0
+  remaining = size - len(prefix)
+  if not _can_finish(last, depth, remaining, True):
+    return 0
+  return _count_opt_help(last, depth, remaining, True, ">" in prefix)
+
+def bf_enum_opt(size, prefix="+"):
+  """Enumerate optimized BF programs of size `size` which start with `prefix`.
 
-def bf_enum_opt(size):
+  The prefix is fixed in the enumerator, so programs with any other start are
+  never generated (rather than being generated and then skipped)."""
   if size >= 4:
     # Optimization: Always end with ]. Any other ending is inefficient.
     # At least for num_steps, you could get the same value by starting with an equal number of >s.
     # For score, the obvious counterexample here is that +++ is max for small sizes ...
     # But even for score, I think there are more efficient ways to compute this in post-processing.
-    for suffix in _bf_enum_opt_help(size - 1, only_end_loop = True):
-      # Optimization: Always start with +. Any other starting symbol is inefficient.
-      # At least for num_steps, - is symmetric with +. >< are a waste and [ will always fail first.
-      # Optimization: No +- (see kExcludePairs comment).
-      if suffix[0] != "-" and is_dir_norm(suffix):
-        yield "+" + suffix
+    # Optimization: Always start with +. Any other starting symbol is inefficient.
+    # At least for num_steps, - is symmetric with +. >< are a waste and [ will always fail first.
+    # Optimization: No +- (see kExcludePairs comment).
+    # Optimization: No < before the first >. Any such program is a mirror
+    # image of one which has > first.
+    for prog in _bf_enum_opt_help(size, prefix=prefix, only_end_loop=True,
+                                  dir_norm=True):
+      yield prog
 
 
 def main():
@@ -93,14 +200,10 @@ def main():
       print(prog)
 
   if args.max_size:
-    for size in range(args.max_size + 1):
-      total_count = sum(1 for prog in bf_enum(size))
-      opt_count = sum(1 for prog in bf_enum_opt(size))
-      print(f"Size {size:4d} / Total {total_count:11_d} / Opt {opt_count:11_d}")
-
-    for size in range(args.max_size + 1, args.max_size + 5):
-      opt_count = sum(1 for prog in bf_enum_opt(size))
-      print(f"Size {size:4d} / Total {'N/A':11s} / Opt {opt_count:11_d}")
+    # Also list a few sizes beyond max_size (these used to only list Opt
+    # counts since they were too slow to enumerate, but counting is cheap).
+    for size in range(args.max_size + 5):
+      print(f"Size {size:4d} / Total {bf_count(size):11_d} / Opt {bf_count_opt(size):11_d}")
 
 if __name__ == "__main__":
   main()
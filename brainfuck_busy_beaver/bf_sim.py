@@ -1,5 +1,17 @@
 import argparse
-import collections
+import array
+import functools
+
+try:
+  # Optional: Used by run_batch and _run_jit if available.
+  import numpy as np
+except ImportError:
+  np = None
+try:
+  # Optional: Used to JIT compile the simulator loop if available.
+  import numba
+except ImportError:
+  numba = None
 
 
 class BF_Format_Error(Exception):
@@ -7,83 +19,661 @@ class BF_Format_Error(Exception):
 
 
 def match_parens(s):
+  """Return array with index of matching paren for each [ and ] in s (and -1
+  for all other instructions). Raises BF_Format_Error if they do not match."""
   stack = []
-  match_locs = {}
+  push = stack.append
+  pop = stack.pop
+  match_locs = array.array("i", [-1]) * len(s)
   for i, c in enumerate(s):
     if c == "[":
-      stack.append(i)
+      push(i)
     elif c == "]":
-      assert stack, s
-      j = stack.pop()
+      if not stack:
+        raise BF_Format_Error(s, i)
+      j = pop()
       match_locs[i] = j
       match_locs[j] = i
-  assert not stack, s
+  if stack:
+    raise BF_Format_Error(s, stack[-1])
   return match_locs
 
-def tape_str(tape, head_loc):
+def tape_str(tape, head):
   parts = []
-  tape[head_loc]
-  for loc in range(min(tape.keys()), max(tape.keys()) + 1):
-    if loc == head_loc:
-      parts.append(f"({tape[loc]:2})")
+  nonzero = [i for i, val in enumerate(tape) if val]
+  for i in range(min(nonzero + [head]), max(nonzero + [head]) + 1):
+    if i == head:
+      parts.append(f"({tape[i]:2})")
     else:
-      parts.append(f" {tape[loc]:2} ")
+      parts.append(f" {tape[i]:2} ")
   return " ".join(parts)
 
+# Opcodes
+kOpInc = 0
+kOpDec = 1
+kOpRight = 2
+kOpLeft = 3
+kOpLoop = 4
+kOpEnd = 5
+kOpNop = 6
+kOpError = 7
+# Idioms (replace the [ op at start of the loop they summarize).
+kOpClear = 8  # [-] or [+]
+kOpMoveAdd = 9  # [->>+<<] or [-<<+>>] (any distance)
+kOpScanLeft = 10  # [-<]
+kOpcodes = {"+": kOpInc, "-": kOpDec, ">": kOpRight, "<": kOpLeft,
+            "[": kOpLoop, "]": kOpEnd,
+            # Treat "." as no-op.
+            ".": kOpNop}
+# Runs of these instructions are collapsed into a single op.
+kRunOps = frozenset([kOpInc, kOpDec, kOpRight, kOpLeft, kOpNop])
+
+def compile_prog(prog, idioms=True):
+  """Compile BF program into arrays (ops, counts, jump, pos) where each op
+  stands for a run of `count` identical instructions starting at `pos` in
+  prog. jump is the op index of the matching paren for [ and ] (-1 otherwise).
+
+  If idioms, the [ op of recognized loops is replaced by an idiom op. The loop
+  body is left in place so that it can still be run one step at a time.
+  """
+  ops = array.array("b")
+  counts = array.array("q")
+  pos = array.array("i")
+  for i, c in enumerate(prog):
+    op = kOpcodes.get(c, kOpError)
+    if op in kRunOps and ops and ops[-1] == op:
+      counts[-1] += 1
+    else:
+      ops.append(op)
+      counts.append(1)
+      pos.append(i)
+  op_index = {p: k for k, p in enumerate(pos)}
+  prog_jump = match_parens(prog)
+  jump = array.array("i", [op_index.get(prog_jump[p], -1) for p in pos])
+  if idioms:
+    for i, op in enumerate(ops):
+      if op == kOpLoop:
+        idiom = match_idiom(ops[i:jump[i] + 1], counts[i:jump[i] + 1])
+        if idiom is not None:
+          ops[i] = idiom
+  return ops, counts, jump, pos
+
+def match_idiom(ops, counts):
+  """Return idiom op for loop ops[0] ... ops[-1] or None if it is not one."""
+  body = list(zip(ops[1:-1], counts[1:-1]))
+  if body in ([(kOpDec, 1)], [(kOpInc, 1)]):
+    return kOpClear
+  if body == [(kOpDec, 1), (kOpLeft, 1)]:
+    return kOpScanLeft
+  if (len(body) == 4 and body[0] == (kOpDec, 1) and body[2] == (kOpInc, 1) and
+      {body[1][0], body[3][0]} == {kOpRight, kOpLeft} and
+      body[1][1] == body[3][1]):
+    return kOpMoveAdd
+  return None
+
+# Handlers for each opcode. Each executes `count` repetitions of the op at
+# index `ip` and returns the next ip.
+def _inc(sim, ip, count):
+  sim.tape[sim.head] += count
+  return ip + 1
+
+def _dec(sim, ip, count):
+  sim.tape[sim.head] -= count
+  return ip + 1
+
+def _right(sim, ip, count):
+  while sim.head + count >= len(sim.tape):
+    sim.grow_tape()
+  sim.head += count
+  return ip + 1
+
+def _left(sim, ip, count):
+  while sim.head - count < 0:
+    sim.grow_tape()
+  sim.head -= count
+  return ip + 1
+
+def _loop(sim, ip, count):
+  if sim.tape[sim.head] == 0:
+    # Jump past closing ].
+    return sim.jump[ip] + 1
+  return ip + 1
+
+def _end(sim, ip, count):
+  if sim.tape[sim.head] != 0:
+    # Jump into loop (past opening [).
+    return sim.jump[ip] + 1
+  return ip + 1
+
+def _nop(sim, ip, count):
+  return ip + 1
+
+def _error(sim, ip, count):
+  raise BF_Format_Error(sim.prog, sim.pos[ip])
+
+kHandlers = (_inc, _dec, _right, _left, _loop, _end, _nop, _error)
+
+# Handlers for idiom ops. Each runs the entire loop starting at `ip` if it
+# finishes within `budget` steps and returns (next ip, steps taken). Otherwise
+# it acts like a normal [ (entering the loop body).
+def _clear(sim, ip, budget):
+  val = sim.tape[sim.head]
+  if sim.ops[ip + 1] == kOpInc:
+    val = -val
+  steps = 1 + 2 * val
+  if val <= 0 or steps > budget:
+    return _loop(sim, ip, 1), 1
+  sim.tape[sim.head] = 0
+  return sim.jump[ip] + 1, steps
+
+def _move_add(sim, ip, budget):
+  val = sim.tape[sim.head]
+  dist = sim.counts[ip + 2]
+  steps = 1 + (2 * dist + 3) * val
+  if val <= 0 or steps > budget:
+    return _loop(sim, ip, 1), 1
+  if sim.ops[ip + 2] == kOpLeft:
+    dist = -dist
+  while not 0 <= sim.head + dist < len(sim.tape):
+    sim.grow_tape()
+  # Update target first, so that tape is unchanged if it overflows.
+  sim.tape[sim.head + dist] += val
+  sim.tape[sim.head] = 0
+  return sim.jump[ip] + 1, steps
+
+def _scan_left(sim, ip, budget):
+  tape = sim.tape
+  head = sim.head
+  end = head
+  while end >= 0 and tape[end]:
+    end -= 1
+  steps = 1 + 3 * (head - end)
+  if end == head or steps > budget:
+    return _loop(sim, ip, 1), 1
+  if end < 0:
+    # Zero we stop at is off the left end of the tape.
+    sim.grow_tape()
+    return _scan_left(sim, ip, budget)
+  vals = [val - 1 for val in tape[end + 1:head + 1]]
+  if isinstance(tape, array.array):
+    vals = array.array("q", vals)
+  tape[end + 1:head + 1] = vals
+  sim.head = end
+  return sim.jump[ip] + 1, steps
+
+kIdiomHandlers = {kOpClear: _clear, kOpMoveAdd: _move_add,
+                  kOpScanLeft: _scan_left}
+
+# Reasons _run_jit stops.
+kStopDone = 0  # Out of steps or halted.
+kStopGrow = 1  # Head needs to move off the end of the tape.
+kStopPython = 2  # Next op must be handled by Python (overflow/error/partial).
+kInt64Max = 2**63 - 1
+kInt64Min = -2**63
+
+if numba:
+  @numba.njit(cache=True)
+  def _run_jit(ops, counts, jump, tape, head, ip, num_steps, end_step):
+    """Compiled version of BFSim.run loop operating on int64 tape.
+
+    Returns (head, ip, num_steps, stop reason)."""
+    while ip < len(ops):
+      op = ops[ip]
+      count = counts[ip]
+      if num_steps + count > end_step:
+        if num_steps < end_step:
+          return head, ip, num_steps, kStopPython
+        return head, ip, num_steps, kStopDone
+      if op == kOpInc:
+        if tape[head] > kInt64Max - count:
+          return head, ip, num_steps, kStopPython
+        tape[head] += count
+      elif op == kOpDec:
+        if tape[head] < kInt64Min + count:
+          return head, ip, num_steps, kStopPython
+        tape[head] -= count
+      elif op == kOpRight:
+        if head + count >= len(tape):
+          return head, ip, num_steps, kStopGrow
+        head += count
+      elif op == kOpLeft:
+        if head - count < 0:
+          return head, ip, num_steps, kStopGrow
+        head -= count
+      elif op == kOpLoop:
+        if tape[head] == 0:
+          ip = jump[ip]
+      elif op == kOpEnd:
+        if tape[head] != 0:
+          ip = jump[ip]
+      elif op == kOpNop:
+        pass
+      elif op == kOpError:
+        return head, ip, num_steps, kStopPython
+      else:
+        # Idioms: Run entire loop if it fits in remaining steps, otherwise
+        # fall back to treating op as a normal [.
+        budget = end_step - num_steps - 1
+        val = tape[head]
+        if op == kOpClear:
+          if ops[ip + 1] == kOpInc:
+            val = -val
+          if 0 < val <= budget // 2:
+            tape[head] = 0
+            ip = jump[ip] + 1
+            num_steps += 1 + 2 * val
+            continue
+        elif op == kOpMoveAdd:
+          dist = counts[ip + 2]
+          if 0 < val <= budget // (2 * dist + 3):
+            if ops[ip + 2] == kOpLeft:
+              dist = -dist
+            if not 0 <= head + dist < len(tape):
+              return head, ip, num_steps, kStopGrow
+            if tape[head + dist] > kInt64Max - val:
+              return head, ip, num_steps, kStopPython
+            tape[head + dist] += val
+            tape[head] = 0
+            ip = jump[ip] + 1
+            num_steps += 1 + (2 * abs(dist) + 3) * val
+            continue
+        elif op == kOpScanLeft:
+          end = head
+          while end >= 0 and tape[end] != 0:
+            if tape[end] == kInt64Min:
+              return head, ip, num_steps, kStopPython
+            end -= 1
+          if end < head and head - end <= budget // 3:
+            if end < 0:
+              return head, ip, num_steps, kStopGrow
+            for i in range(end + 1, head + 1):
+              tape[i] -= 1
+            num_steps += 1 + 3 * (head - end)
+            head = end
+            ip = jump[ip] + 1
+            continue
+        if val == 0:
+          ip = jump[ip]
+      ip += 1
+      num_steps += count
+    return head, ip, num_steps, kStopDone
+
+def python_source(ops, counts, jump):
+  """Return Python source for function
+    _run(tape, h, steps, end_step, grow) -> (h, ip, steps)
+  which runs the compiled BF program on a list tape starting from the first
+  op. Runs of ops between brackets are merged into one block using literal
+  tape offsets. A block only runs if all of its steps fit before end_step,
+  otherwise _run returns early with ip of that block so that the caller can
+  finish it one step at a time.
+  """
+  lines = ["def _run(tape, h, steps, end_step, grow):"]
+  # Indentation to restore when closing each open loop.
+  loop_indents = []
+  indent = 1
+  def emit(line):
+    lines.append("  " * indent + line)
+  def grow_check(lo, hi):
+    conds = []
+    if lo < 0:
+      conds.append(f"h < {-lo}")
+    if hi > 0:
+      conds.append(f"h >= len(tape) - {hi}")
+    if conds:
+      emit(f"if {' or '.join(conds)}: tape, h = grow(h, {lo}, {hi})")
+  def add(var, val):
+    emit(f"{var} += {val}" if val > 0 else f"{var} -= {-val}")
+  def cell(offset):
+    if offset == 0:
+      return "tape[h]"
+    return f"tape[h + {offset}]" if offset > 0 else f"tape[h - {-offset}]"
+
+  ip = 0
+  while ip < len(ops):
+    op = ops[ip]
+    if op in kRunOps:
+      start = ip
+      offset = lo = hi = cost = 0
+      adds = {}
+      while ip < len(ops) and ops[ip] in kRunOps:
+        op, count = ops[ip], counts[ip]
+        if op == kOpInc:
+          adds[offset] = adds.get(offset, 0) + count
+        elif op == kOpDec:
+          adds[offset] = adds.get(offset, 0) - count
+        elif op == kOpRight:
+          offset += count
+        elif op == kOpLeft:
+          offset -= count
+        lo = min(lo, offset)
+        hi = max(hi, offset)
+        cost += count
+        ip += 1
+      emit(f"if steps > end_step - {cost}: return h, {start}, steps")
+      grow_check(lo, hi)
+      for offset_add, val in adds.items():
+        if val:
+          add(cell(offset_add), val)
+      if offset:
+        add("h", offset)
+      emit(f"steps += {cost}")
+      continue
+
+    emit(f"if steps >= end_step: return h, {ip}, steps")
+    if op == kOpEnd:
+      emit("steps += 1")
+      indent = loop_indents.pop()
+    else:
+      loop_indents.append(indent)
+      if op in (kOpClear, kOpMoveAdd):
+        # Run entire loop at once if it fits in remaining steps.
+        if op == kOpClear:
+          sign = "-" if ops[ip + 1] == kOpInc else ""
+          # Steps per loop iteration.
+          cost = 2
+        else:
+          sign = ""
+          dist = counts[ip + 2] if ops[ip + 2] == kOpRight else -counts[ip + 2]
+          cost = 2 * abs(dist) + 3
+        emit(f"v = {sign}tape[h]")
+        emit(f"if 0 < v and steps + 1 + {cost} * v <= end_step:")
+        indent += 1
+        if op == kOpMoveAdd:
+          grow_check(min(dist, 0), max(dist, 0))
+          emit(f"{cell(dist)} += v")
+        emit("tape[h] = 0")
+        emit(f"steps += 1 + {cost} * v")
+        indent -= 1
+        emit("else:")
+        indent += 1
+      emit("steps += 1")
+      emit("while tape[h]:")
+      indent += 1
+    ip += 1
+  lines.append(f"  return h, {len(ops)}, steps")
+  return "\n".join(lines) + "\n"
+
+@functools.lru_cache(maxsize=1024)
+def compile_python(prog, idioms=True):
+  """Compile BF program into a Python function (see python_source).
+
+  Returns None if the program cannot be compiled this way (formatting errors
+  or loops nested too deep for the Python compiler)."""
+  ops, counts, jump, _ = compile_prog(prog, idioms)
+  if kOpError in ops:
+    return None
+  try:
+    code = compile(python_source(ops, counts, jump), f"<bf {prog}>", "exec")
+  except (SyntaxError, RecursionError):
+    return None
+  namespace = {}
+  exec(code, namespace)
+  return namespace["_run"]
+
 class BFSim:
-  def __init__(self, bf_prog: str):
+  def __init__(self, bf_prog: str, idioms: bool = True, codegen: bool = False,
+               jit: bool = True):
     self.prog = bf_prog
+    self.idioms = idioms
+    # Translate program into Python source (worthwhile for long runs only).
+    self.codegen = codegen
+    # Use numba compiled loop (if numba is available).
+    self.jit = jit
     # Tape is a two-way infinite set of registers. Each holds an unbounded integer.
-    self.tape = collections.defaultdict(int)
-    # Tape location. Starts at 0.
-    self.loc = 0
-    # Instruction pointer. Starts at beginning of program.
-    self.instr = 0
+    # We store the (finite) part visited so far in a contiguous array of int64s
+    # (switching to a list of Python ints if any value gets too large) which
+    # is grown as needed. Tape location 0 is stored at index self.origin.
+    self.tape = array.array("q", [0] * 64)
+    self.origin = 32
+    # Tape index of head (current tape location + origin).
+    self.head = self.origin
 
-    # Pre-process prog to locate matching parentheses.
-    self.jump_loc = match_parens(self.prog)
+    # Pre-process prog into ops (collapsing runs of repeated instructions and
+    # recognizing common loop idioms) and locate matching parentheses.
+    self.ops, self.counts, self.jump, self.pos = compile_prog(self.prog, idioms)
+    # Op pointer. Starts at beginning of program.
+    self.ip = 0
+    # Number of instructions of op self.ip that have already run (if we
+    # stopped part way through a run).
+    self.offset = 0
 
     # Stats
     self.num_steps = 0
 
+  @property
+  def instr(self):
+    """Instruction pointer (index into self.prog)."""
+    if self.ip < len(self.ops):
+      return self.pos[self.ip] + self.offset
+    return len(self.prog)
+
   def is_running(self):
-    return self.instr < len(self.prog)
+    return self.ip < len(self.ops)
 
   def score(self):
-    return max(self.tape.values(), default=0)
+    """Max register on the (infinite, zero initialized) tape. This is never
+    negative, since all registers the program didn't reach are 0."""
+    return max(self.tape)
+
+  def grow_tape(self):
+    """Double tape size, adding space on both ends."""
+    pad = [0] * (len(self.tape) // 2)
+    if isinstance(self.tape, array.array):
+      pad = array.array("q", pad)
+    self.tape = pad + self.tape + pad
+    self.origin += len(pad)
+    self.head += len(pad)
 
   def run(self, steps, verbose=False):
     end_step = self.num_steps + steps
-    while self.num_steps < end_step and self.is_running():
-      if verbose:
-        print(f"{self.num_steps:5_d} : {self.instr:3d} {self.prog[self.instr]} :  {tape_str(self.tape, self.loc)}")
-      self.step()
+    if self.codegen and not verbose and self.ip == 0 and self.offset == 0:
+      self._run_codegen(end_step)
+    elif numba and self.jit and not verbose and self.offset == 0:
+      self._run_jit(end_step)
+    self._run_python(end_step, verbose)
+
+  def _run_jit(self, end_step):
+    """Run using the compiled loop for as long as the tape fits in int64s."""
+    ops = np.frombuffer(self.ops, dtype=np.int8)
+    counts = np.frombuffer(self.counts, dtype=np.int64)
+    jump = np.frombuffer(self.jump, dtype=np.int32)
+    while isinstance(self.tape, array.array):
+      tape = np.frombuffer(self.tape, dtype=np.int64)
+      self.head, self.ip, self.num_steps, stop = _run_jit(
+        ops, counts, jump, tape, self.head, self.ip, self.num_steps, end_step)
+      if stop == kStopGrow:
+        self.grow_tape()
+      else:
+        # Done, or next op needs _run_python.
+        return
+
+  def _run_codegen(self, end_step):
+    """Run from start of program using compile_python()."""
+    run = compile_python(self.prog, self.idioms)
+    if run:
+      self.tape = list(self.tape)
+      self.head, self.ip, self.num_steps = run(
+        self.tape, self.head, self.num_steps, end_step, self._grow_for)
+
+  def _grow_for(self, head, lo, hi):
+    """Grow tape until head + lo and head + hi are both on it.
+    Returns (tape, head) (used by compile_python code)."""
+    self.head = head
+    while not 0 <= self.head + lo <= self.head + hi < len(self.tape):
+      self.grow_tape()
+    return self.tape, self.head
+
+  def _run_python(self, end_step, verbose):
+    # Keep hot state in locals, only write it back when we stop.
+    ops = self.ops
+    counts = self.counts
+    handlers = kHandlers
+    idiom_handlers = kIdiomHandlers
+    num_ops = len(ops)
+    ip = self.ip
+    offset = self.offset
+    num_steps = self.num_steps
+    try:
+      while ip < num_ops:
+        count = counts[ip] - offset
+        if num_steps + count > end_step:
+          break
+        if verbose:
+          instr = self.pos[ip] + offset
+          print(f"{num_steps:5_d} : {instr:3d} {self.prog[instr]}x{count} :  {tape_str(self.tape, self.head)}")
+        op = ops[ip]
+        try:
+          if op < kOpClear:
+            ip = handlers[op](self, ip, count)
+          else:
+            ip, count = idiom_handlers[op](self, ip, end_step - num_steps)
+        except OverflowError:
+          # Value does not fit in int64. Switch to unbounded ints and retry.
+          self.tape = list(self.tape)
+          continue
+        offset = 0
+        num_steps += count
+
+      if ip < num_ops and num_steps < end_step:
+        # Only part of the next run fits in the remaining steps.
+        count = end_step - num_steps
+        try:
+          handlers[ops[ip]](self, ip, count)
+        except OverflowError:
+          self.tape = list(self.tape)
+          handlers[ops[ip]](self, ip, count)
+        offset += count
+        num_steps += count
+    finally:
+      self.ip = ip
+      self.offset = offset
+      self.num_steps = num_steps
 
   def step(self):
-    if self.is_running():
-      if self.prog[self.instr] == "+":
-        self.tape[self.loc] += 1
-      elif self.prog[self.instr] == "-":
-        self.tape[self.loc] -= 1
-      elif self.prog[self.instr] == ">":
-        self.loc += 1
-      elif self.prog[self.instr] == "<":
-        self.loc -= 1
-      elif self.prog[self.instr] == "[":
-        if self.tape[self.loc] == 0:
-          # Jump to closing ]. Then increment below will move out of loop.
-          self.instr = self.jump_loc[self.instr]
-      elif self.prog[self.instr] == "]":
-        if self.tape[self.loc] != 0:
-          # Jump to opening [. Then increment will move into loop.
-          self.instr = self.jump_loc[self.instr]
-      elif self.prog[self.instr] != ".":
-        # Treat "." as no-op.
-        raise BF_Format_Error(self.prog, self.instr)
-
-      # Advance to next instruction.
-      self.instr += 1
-      self.num_steps += 1
+    self.run(1)
+
+
+def run_batch(progs, steps, tape_size=512):
+  """Simulate each program in progs for up to `steps` steps.
+
+  All programs are stepped together in lockstep using numpy (one op of every
+  unfinished program per iteration), so this is much faster than a BFSim per
+  program when there are many programs and numba is not available. Programs
+  which move off a tape of `tape_size` cells are finished using BFSim.
+
+  Returns numpy arrays (num_steps, running, score) with values for each program.
+  """
+  compiled = [compile_prog(prog, idioms=False) for prog in progs]
+  num_progs = len(progs)
+  # Concatenate all programs into one set of arrays (with jumps pointing to
+  # absolute op indexes). Each sim has a slice of a single flat tape as well.
+  lens = np.array([len(ops) for ops, _, _, _ in compiled], dtype=np.int64)
+  starts = np.zeros(num_progs, dtype=np.int64)
+  np.cumsum(lens[:-1], out=starts[1:])
+  ops = np.frombuffer(b"".join(c[0].tobytes() for c in compiled), dtype=np.int8)
+  counts = np.frombuffer(b"".join(c[1].tobytes() for c in compiled),
+                         dtype=np.int64)
+  jump = np.frombuffer(b"".join(c[2].tobytes() for c in compiled),
+                       dtype=np.int32) + np.repeat(starts, lens)
+  tape = np.zeros(num_progs * tape_size, dtype=np.int64)
+  # Note: Each step changes a cell by at most 1, so values cannot overflow.
+
+  num_steps = np.zeros(num_progs, dtype=np.int64)
+  running = np.zeros(num_progs, dtype=bool)
+  ip = starts.copy()
+  # Number of instructions of op ip already run (if stopped part way through).
+  offset = np.zeros(num_progs, dtype=np.int64)
+  head = np.arange(num_progs, dtype=np.int64) * tape_size + tape_size // 2
+  # Programs with formatting errors are left for BFSim to raise on.
+  fallback = np.array([kOpError in c[0] for c in compiled], dtype=bool)
+
+  # State of sims still running (indexed by position in `sims`).
+  sims = np.flatnonzero((lens > 0) & ~fallback)
+  sim_ip = ip[sims]
+  sim_head = head[sims]
+  sim_steps = num_steps[sims]
+  sim_end = starts[sims] + lens[sims]
+  sim_tape_start = sims * tape_size
+  while sims.size:
+    op = ops[sim_ip]
+    full_count = counts[sim_ip]
+    count = np.minimum(full_count, steps - sim_steps)
+    val = tape[sim_head]
+    tape[sim_head] = val + kValDelta[op] * count
+    sim_head += kHeadDelta[op] * count
+    jumps = (op == kOpLoop) & (val == 0) | (op == kOpEnd) & (val != 0)
+    sim_ip = np.where(jumps, jump[sim_ip], sim_ip) + 1
+    sim_steps += count
+
+    off_tape = ((sim_head < sim_tape_start) |
+                (sim_head >= sim_tape_start + tape_size))
+    stop = off_tape | (sim_ip >= sim_end) | (sim_steps >= steps)
+    if stop.any():
+      done = sims[stop]
+      # Stopped in the middle of a run of instructions (only possible for ops
+      # which don't jump, so that the run is at sim_ip - 1).
+      partial = count[stop] < full_count[stop]
+      ip[done] = sim_ip[stop] - partial
+      offset[done] = np.where(partial, count[stop], 0)
+      head[done] = sim_head[stop]
+      num_steps[done] = sim_steps[stop]
+      running[done] = (sim_ip[stop] < sim_end[stop]) | partial
+      fallback[sims[off_tape]] = True
+      keep = ~stop
+      sims = sims[keep]
+      sim_ip = sim_ip[keep]
+      sim_head = sim_head[keep]
+      sim_steps = sim_steps[keep]
+      sim_end = sim_end[keep]
+      sim_tape_start = sim_tape_start[keep]
+
+  tape = tape.reshape(num_progs, tape_size)
+  score = tape.max(axis=1)
+  for i in np.flatnonzero(fallback):
+    sim = BFSim(progs[i], idioms=False)
+    if num_steps[i]:
+      # Continue from where we left off, with tape padded so head is on it.
+      sim.tape = array.array("q", bytes(8 * tape_size)) * 3
+      sim.tape[tape_size:2 * tape_size] = array.array("q", tape[i].tobytes())
+      sim.origin = tape_size + tape_size // 2
+      sim.head = int(head[i]) - i * tape_size + tape_size
+      # A long run may have moved the head past the padding.
+      while not 0 <= sim.head < len(sim.tape):
+        sim.grow_tape()
+      sim.ip = int(ip[i] - starts[i])
+      sim.offset = int(offset[i])
+      sim.num_steps = int(num_steps[i])
+    sim.run(steps - sim.num_steps)
+    num_steps[i] = sim.num_steps
+    running[i] = sim.is_running()
+    score[i] = sim.score()
+  return num_steps, running, score
+
+if np is not None:
+  # Per-opcode effects used by run_batch.
+  kValDelta = np.zeros(kOpScanLeft + 1, dtype=np.int64)
+  kValDelta[kOpInc] = 1
+  kValDelta[kOpDec] = -1
+  kHeadDelta = np.zeros(kOpScanLeft + 1, dtype=np.int64)
+  kHeadDelta[kOpRight] = 1
+  kHeadDelta[kOpLeft] = -1
+
+
+def check_modes(bf_prog, steps):
+  """Check that all ways of simulating bf_prog (with or without idioms, numba,
+  codegen or run_batch) agree with the plain Python loop."""
+  def result(sim):
+    sim.run(steps)
+    return sim.num_steps, sim.is_running(), sim.score(), sum(sim.tape)
+  expected = result(BFSim(bf_prog, idioms=False, jit=False))
+  for idioms in (False, True):
+    for jit, codegen in ((True, False), (False, True)):
+      actual = result(BFSim(bf_prog, idioms=idioms, codegen=codegen, jit=jit))
+      assert actual == expected, (bf_prog, idioms, jit, codegen, actual, expected)
+  if np is not None:
+    num_steps, running, score = run_batch([bf_prog], steps)
+    actual = (num_steps[0], running[0], score[0])
+    assert actual == expected[:3], (bf_prog, "run_batch", actual, expected)
 
 
 def main():
@@ -91,9 +681,16 @@ def main():
   parser.add_argument("bf_prog")
   parser.add_argument("num_steps", nargs="?", type=int, default=1_000_000)
   parser.add_argument("--verbose", "-v", action="store_true")
+  parser.add_argument("--codegen", action="store_true",
+                      help="Translate program into Python code before running.")
+  parser.add_argument("--check", action="store_true",
+                      help="Check that all simulation modes agree on this program.")
   args = parser.parse_args()
 
-  sim = BFSim(args.bf_prog)
+  if args.check:
+    check_modes(args.bf_prog, args.num_steps)
+
+  sim = BFSim(args.bf_prog, codegen=args.codegen)
   sim.run(args.num_steps, args.verbose)
   if sim.is_running():
     print("Over steps")
@@ -102,7 +699,7 @@ def main():
   print(f"Program size: {len(args.bf_prog):_d}")
   print(f"Num steps: {sim.num_steps:_d}")
   print(f"Max register: {sim.score():_d}")
-  print(f"Sum registers: {sum(sim.tape.values()):_d}")
+  print(f"Sum registers: {sum(sim.tape):_d}")
 
 if __name__ == "__main__":
   main()
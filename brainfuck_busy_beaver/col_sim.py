@@ -1,6 +1,7 @@
 # Simulate various "collatz-like" iterated functions.
 
-import math
+import concurrent.futures
+import os
 
 
 # Simulate +[-> +*(N+1) [-<]>]
@@ -17,10 +18,27 @@ def A_naive(N):
     else:
       x = N*(k+1)
 
+def shifted_sum(terms, shift):
+  """Return sum(term << (shift * k) for k, term in enumerate(terms)).
+
+  Adds halves recursively so that most additions are on small numbers."""
+  if len(terms) == 1:
+    return terms[0]
+  mid = len(terms) // 2
+  return (shifted_sum(terms[:mid], shift) +
+          (shifted_sum(terms[mid:], shift) << (shift * mid)))
+
 def A_fast(m):
   N = 2**m + 1
   if N > 2:
-    A = (N**(m+1) - 2**(m+1)) // (N - 2)
+    # N**(m+1) is the slow part for large m. But since N = 2^m + 1 we can
+    # expand it with the binomial theorem into a sum of shifted binomial
+    # coefficients: N^(m+1) = sum_k C(m+1, k) 2^(mk)
+    binoms = [1]
+    for k in range(m + 1):
+      binoms.append(binoms[-1] * (m + 1 - k) // (k + 1))
+    N_pow = shifted_sum(binoms, m)
+    A = (N_pow - (1 << (m+1))) // (N - 2)
     return N * (A + 1) // 2
 
 
@@ -78,36 +96,37 @@ def opt_B(max_size=100):
 
 
 # Simulate +A[+B>+C>-D[<]>->]
+# Which counter limits the next block of iterations in C1.
+kLimA = 0
+kLimB = 1
+kLimC = 2
+
 def C1(A, B, C, D, *, verbose=False, max_iters=1_000):
   a, b, c = 0, A, 0
   iters = 0
   while b != 0:
-    k = math.inf
-    lim = None
-    k_c, r_c = divmod(-c, C)
-    if r_c == 0 and 0 < k_c < k:
-      k = k_c
-      lim = "c"
+    # Find smallest valid k (ties go to c, then b, then a).
+    k = a + 1
+    lim = kLimA if k > 0 else None
     k_b, r_b = divmod(-b, B)
-    if r_b == 0 and 0 < k_b < k:
-      k = k_b
-      lim = "b"
-    if 0 < a + 1 < k:
-      k = a + 1
-      lim = "a"
+    if r_b == 0 and k_b > 0 and (lim is None or k_b <= k):
+      k, lim = k_b, kLimB
+    k_c, r_c = divmod(-c, C)
+    if r_c == 0 and k_c > 0 and (lim is None or k_c <= k):
+      k, lim = k_c, kLimC
 
     if verbose:
       print("... C1", a, b, c, lim, k)
 
-    if lim == "c":
+    if lim == kLimC:
       # -> [a-k, b+Bk, c + Ck = 0, -Dk - 1, 0*]
       return max(a-k, b + B*k)
 
-    elif lim == "b":
+    elif lim == kLimB:
       # -> [a-k, b + Bk = 0, c + Ck - 1, -Dk*]
       a, b, c = c + C*k - 1, -D * k, 0
 
-    elif lim == "a":
+    elif lim == kLimA:
       a, b, c = b + B*(a+1) - 1, c + C*(a+1), -D*(a+1)
 
     else:
@@ -120,34 +139,43 @@ def C1(A, B, C, D, *, verbose=False, max_iters=1_000):
   assert b == 0, (a, b, c)
   return a
 
-def opt_C(max_size=100):
+def par_map(executor, num_procs, func, params):
+  """Evaluate func(*p) for each p in params using executor (in order)."""
+  # A few chunks per worker so that slow (non-halting) params even out.
+  chunksize = len(params) // (4 * num_procs) + 1
+  return executor.map(func, *zip(*params), chunksize=chunksize)
+
+def opt_C(max_size=100, num_procs=None):
   max_score = 0
   best_params = []
-  for size in range(14, max_size + 1):
-    par_sum = size - 10
-    is_improved = False
-    for A in range(1, par_sum - 2):
-      for B in range(1, par_sum - A - 1):
-        for C in range(1, par_sum - A - B):
-          D = par_sum - A - B - C
-          assert D >= 1, D
-          score = C1(A, B, C, D)
-          if score and score > max_score:
-            max_score = score
-            best_params = (size, A, B, C, D)
-            is_improved = True
-    if is_improved:
-      size, A, B, C, D = best_params
-      prog = ("+" * A +
-              "[" +
-              "+" * B +
-              ">" +
-              "+" * C +
-              ">" +
-              "-" * D +
-              "[<]>->]")
-      assert len(prog) == size, (prog, size)
-      print(f"Size {size:2d} / Score = {max_score:,d} / {best_params} / {prog}")
+  num_procs = num_procs or os.cpu_count()
+  with concurrent.futures.ProcessPoolExecutor(num_procs) as executor:
+    for size in range(14, max_size + 1):
+      par_sum = size - 10
+      is_improved = False
+      params = [(A, B, C, par_sum - A - B - C)
+                for A in range(1, par_sum - 2)
+                for B in range(1, par_sum - A - 1)
+                for C in range(1, par_sum - A - B)]
+      for (A, B, C, D), score in zip(params,
+                                     par_map(executor, num_procs, C1, params)):
+        assert D >= 1, D
+        if score and score > max_score:
+          max_score = score
+          best_params = (size, A, B, C, D)
+          is_improved = True
+      if is_improved:
+        size, A, B, C, D = best_params
+        prog = ("+" * A +
+                "[" +
+                "+" * B +
+                ">" +
+                "+" * C +
+                ">" +
+                "-" * D +
+                "[<]>->]")
+        assert len(prog) == size, (prog, size)
+        print(f"Size {size:2d} / Score = {max_score:,d} / {best_params} / {prog}")
 
 # print(C1(2, 2, 1, 3, verbose = True))
 # print(C1(1, 1, 1, 5, verbose = True))
@@ -175,32 +203,36 @@ def D1(A, B, C, *, verbose=False, max_iters=1_000):
   # a b* c -> a-b 0* c+Bb Cb -> Halt
   return max(a - b, c + B*b, C*b)
 
-def opt_D(max_size):
+def opt_D(max_size, num_procs=None):
   max_score = 0
   best_params = []
-  for size in range(14, max_size + 1):
-    par_sum = size - 13
-    is_improved = False
-    for A in range(par_sum):
-      for B in range(par_sum - A):
-        C = par_sum - A - B
+  num_procs = num_procs or os.cpu_count()
+  with concurrent.futures.ProcessPoolExecutor(num_procs) as executor:
+    for size in range(14, max_size + 1):
+      par_sum = size - 13
+      is_improved = False
+      params = [(A, B, par_sum - A - B)
+                for A in range(par_sum)
+                for B in range(par_sum - A)]
+      for (A, B, C), score in zip(params,
+                                  par_map(executor, num_procs, D1, params)):
         assert C >= 1, (A, B, C)
-        score = D1(A, B, C)
         if score and score > max_score:
           max_score = score
           best_params = (size, A, B, C)
           is_improved = True
-    if is_improved:
-      size, A, B, C = best_params
-      prog = ("+" * (A+1) +
-              "[>" +
-              "+" * (B+1) +
-              ">" +
-              "+" * (C+1) +
-              "[-<]>>]")
-      assert len(prog) == size, (prog, size)
-      print(f"Size {size:2d} / Score = {max_score:e} / {best_params} / {prog}")
-
-print(D1(0, 1, 2, verbose = True))
-print()
-opt_D(50)
+      if is_improved:
+        size, A, B, C = best_params
+        prog = ("+" * (A+1) +
+                "[>" +
+                "+" * (B+1) +
+                ">" +
+                "+" * (C+1) +
+                "[-<]>>]")
+        assert len(prog) == size, (prog, size)
+        print(f"Size {size:2d} / Score = {max_score:e} / {best_params} / {prog}")
+
+if __name__ == "__main__":
+  print(D1(0, 1, 2, verbose = True))
+  print()
+  opt_D(50)
@@ -1,20 +1,33 @@
 import argparse
+import functools
 
+@functools.cache
 def paren_enum(size):
-  """Enumerate strings in the alphabet "[]." with matching parens."""
+  """List strings in the alphabet "[]." with matching parens.
+
+  Cached, so each smaller size is only enumerated once."""
   if size == 0:
-    yield ""
-  else:
-    # 1) All strings ending in .
-    for prefix in paren_enum(size - 1):
-      yield prefix + "."
-    # 2) All strings ending in ]
-    if size >= 2:
-      for loop_len in range((size - 2) + 1):
-        prefix_len = size - 2 - loop_len
-        for prefix in paren_enum(prefix_len):
-          for loop in paren_enum(loop_len):
-            yield prefix + "[" + loop + "]"
+    return ("",)
+  strs = []
+  # 1) All strings ending in .
+  for prefix in paren_enum(size - 1):
+    strs.append(prefix + ".")
+  # 2) All strings ending in ]
+  for loop_len in range((size - 2) + 1):
+    prefix_len = size - 2 - loop_len
+    for prefix in paren_enum(prefix_len):
+      for loop in paren_enum(loop_len):
+        strs.append(prefix + "[" + loop + "]")
+  return tuple(strs)
+
+def paren_count(size):
+  """Number of strings paren_enum(size) lists (without enumerating them)."""
+  counts = [1]
+  for n in range(1, size + 1):
+    counts.append(counts[n - 1] +
+                  sum(counts[n - 2 - loop_len] * counts[loop_len]
+                      for loop_len in range(n - 1)))
+  return counts[size]
 
 
 
@@ -24,8 +37,7 @@ def main():
   args = parser.parse_args()
 
   for size in range(args.max_size + 1):
-    total_count = sum(1 for prog in paren_enum(size))
-    print(f"Size {size:4d} / Total {total_count:11_d}")
+    print(f"Size {size:4d} / Total {paren_count(size):11_d}")
 
 if __name__ == "__main__":
   main()
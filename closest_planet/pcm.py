@@ -3,8 +3,8 @@
 
 import argparse
 import collections
-import math
-import random
+
+import numpy as np
 
 
 # Semi-major axis in AUs. From https://windows2universe.org/our_solar_system/planets_orbits_table.html
@@ -30,47 +30,70 @@ kPlanetRadiusAu = {
   # "eris":     67.6681,
 }
 
-def polar2cart(r, theta):
-  return (r * math.cos(theta), r * math.sin(theta))
-
-def distance(p1, p2):
-  (x1, y1) = p1
-  (x2, y2) = p2
-  return math.sqrt((x2-x1)**2 + (y2-y1)**2)
-
-def random_orbital_positions():
-  return {
-    planet : polar2cart(kPlanetRadiusAu[planet], random.uniform(0, 2 * math.pi))
-    for planet in kPlanetRadiusAu
-  }
-
-def closest_planet(source, locs):
-  max_dist = math.inf
-  closest = None
-  for dest in locs:
-    if dest != source:
-      dist = distance(locs[source], locs[dest])
-      if dist < max_dist:
-        max_dist = dist
-        closest = dest
-  return closest
+def sample_closest(source, num_samples, batch_size=100_000):
+  """Count how often each planet is closest to source, placing all planets at
+  independent uniformly random angles along their orbits."""
+  rng = np.random.default_rng()
+  names = list(kPlanetRadiusAu)
+  radii = np.fromiter(kPlanetRadiusAu.values(), dtype=np.float64)
+  source_index = names.index(source)
+  source_radius = radii[source_index]
+  counts = np.zeros(len(names), dtype=np.int64)
+  for start in range(0, num_samples, batch_size):
+    size = min(batch_size, num_samples - start)
+    # Only the angle between each planet and source matters, and these are also
+    # independent and uniform. So (by the law of cosines) squared distances are:
+    angles = rng.uniform(0, 2 * np.pi, (size, len(names)))
+    dist2 = (source_radius**2 + radii**2 -
+             2 * source_radius * radii * np.cos(angles))
+    dist2[:, source_index] = np.inf
+    counts += np.bincount(dist2.argmin(axis=1), minlength=len(names))
+  return collections.Counter({name: int(count)
+                              for name, count in zip(names, counts) if count})
 
-def sample_closest(source, num_samples):
-  closests = collections.Counter()
-  for _ in range(num_samples):
-    locs = random_orbital_positions()
-    neighbor = closest_planet(source, locs)
-    closests[neighbor] += 1
-  return closests
+def closest_probs(source, num_points=100_000):
+  """Probability that each planet is closest to source (under the same model
+  as sample_closest), computed by numerical integration instead of sampling.
+  """
+  names = list(kPlanetRadiusAu)
+  radii = np.fromiter(kPlanetRadiusAu.values(), dtype=np.float64)
+  source_radius = radii[names.index(source)]
+  # Angles (between planet j and source) to integrate over. By symmetry we
+  # only need [0, pi]. Midpoint rule.
+  angles = (np.arange(num_points) + 0.5) * (np.pi / num_points)
+  probs = {}
+  for j, name in enumerate(names):
+    if name == source:
+      continue
+    # Squared distance from source to j at each angle.
+    dist2 = (source_radius**2 + radii[j]**2 -
+             2 * source_radius * radii[j] * np.cos(angles))
+    # Planet k is further than j iff cos(angle_k) < cos_lim, which has
+    # probability 1 - arccos(cos_lim) / pi.
+    prob = np.ones(num_points)
+    for k in range(len(names)):
+      if k != j and names[k] != source:
+        cos_lim = ((source_radius**2 + radii[k]**2 - dist2) /
+                   (2 * source_radius * radii[k]))
+        prob *= 1 - np.arccos(np.clip(cos_lim, -1, 1)) / np.pi
+    probs[name] = prob.mean()
+  return probs
 
 def main():
   parser = argparse.ArgumentParser()
   parser.add_argument("source", choices=kPlanetRadiusAu.keys())
-  parser.add_argument("num_samples", type=int)
+  parser.add_argument("--monte-carlo", type=int, metavar="NUM_SAMPLES",
+                      help="Estimate by random sampling instead of integrating.")
   args = parser.parse_args()
 
-  closests = sample_closest(args.source, args.num_samples)
-  for name in sorted(closests, key=lambda x: closests[x], reverse=True):
-    print(f"{name:20s} : {closests[name] / args.num_samples:.3%}")
+  if args.monte_carlo:
+    closests = sample_closest(args.source, args.monte_carlo)
+    probs = {name: count / args.monte_carlo
+             for name, count in closests.items()}
+  else:
+    probs = closest_probs(args.source)
+  for name in sorted(probs, key=lambda x: probs[x], reverse=True):
+    if probs[name] > 0:
+      print(f"{name:20s} : {probs[name]:.3%}")
 
 main()
@@ -9,13 +9,18 @@ If both play the same value card, both discard. Repeat. First player who runs ou
 
 from __future__ import annotations
 
+import bisect
 from dataclasses import dataclass
 # from fractions import Fraction
 import functools
 from typing import Iterable, Iterator
 
-import nashpy
 import numpy as np
+try:
+  # Optional: Used to JIT compile the simplex solver if available.
+  import numba
+except ImportError:
+  numba = None
 
 
 # Types
@@ -30,19 +35,34 @@ class Hand:
   def __init__(self, data : Iterable[Card]):
     object.__setattr__(self, 'data', tuple(sorted(data)))
 
+  @staticmethod
+  def from_sorted(data : tuple) -> Hand:
+    """Hand for already sorted tuple of cards. Equal hands created this way
+    are shared, so that comparing them (in evaluate's cache) is cheap."""
+    hand = _hand_pool.get(data)
+    if hand is None:
+      hand = object.__new__(Hand)
+      object.__setattr__(hand, 'data', data)
+      _hand_pool[data] = hand
+    return hand
+
   def add(self, card : Card) -> Hand:
-    return Hand(self.data + (card,))
+    i = bisect.bisect_right(self.data, card)
+    return Hand.from_sorted(self.data[:i] + (card,) + self.data[i:])
 
   def remove(self, card : Card) -> Hand:
-    hand = list(self.data)
-    # Will raise error if card not in hand.
-    hand.remove(card)
-    return Hand(hand)
-  
+    i = bisect.bisect_left(self.data, card)
+    if i == len(self.data) or self.data[i] != card:
+      raise ValueError(f"{card} not in {self}")
+    return Hand.from_sorted(self.data[:i] + self.data[i+1:])
+
   def unique_cards(self) -> Iterator[Card]:
     """Iterate through cards, but only one of each value."""
-    for card in sorted(set(self.data)):
-      yield card
+    # data is sorted, so this is in increasing order.
+    return iter(dict.fromkeys(self.data))
+
+# Canonical Hand for each sorted tuple of cards (see Hand.from_sorted).
+_hand_pool : dict[tuple, Hand] = {}
 
 @dataclass(frozen=True)
 class Move:
@@ -79,13 +99,147 @@ Strategy = np.array # array of Value
 @dataclass(frozen=True)
 class StrategyNode:
   value : Value
-  game : nashpy.Game | None = None
+  # Utility matrix for player 1 (see evaluate).
+  util : np.ndarray | None = None
   strat1 : Strategy | None = None
   strat2 : Strategy | None = None
 
 
-@functools.cache
+def prune_dominated(util : np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+  """Iteratively remove (weakly) dominated strategies from zero-sum game
+  with utility matrix `util` for player 1. This does not change the value of
+  the game and any equilibrium of the pruned game is one of the original.
+
+  Returns (rows, cols) indexes of the remaining strategies."""
+  rows = np.arange(util.shape[0])
+  cols = np.arange(util.shape[1])
+  while True:
+    sub = util[np.ix_(rows, cols)]
+    # row_dom[i, j] = row i is dominated by row j (or a duplicate of an earlier
+    # row j). Player 1 wants higher values, player 2 lower.
+    n = len(rows)
+    row_dom = ((sub[:, None, :] <= sub[None, :, :]).all(axis=2) &
+               ((sub[:, None, :] < sub[None, :, :]).any(axis=2) |
+                np.tri(n, k=-1, dtype=bool)))
+    m = len(cols)
+    col_dom = ((sub.T[:, None, :] >= sub.T[None, :, :]).all(axis=2) &
+               ((sub.T[:, None, :] > sub.T[None, :, :]).any(axis=2) |
+                np.tri(m, k=-1, dtype=bool)))
+    keep_rows = ~row_dom.any(axis=1)
+    keep_cols = ~col_dom.any(axis=1)
+    if keep_rows.all() and keep_cols.all():
+      return rows, cols
+    rows = rows[keep_rows]
+    cols = cols[keep_cols]
+
+def saddle_point(util : np.ndarray) -> tuple[int, int] | None:
+  """Return (row, col) of a pure strategy equilibrium (saddle point) of
+  zero-sum game with utility matrix `util` for player 1, if there is one.
+  Always exists if either player has only one choice."""
+  # Player 1's maximin row and player 2's minimax column. They are an
+  # equilibrium iff maximin == minimax.
+  row = util.min(axis=1).argmax()
+  col = util.max(axis=0).argmin()
+  if util[row].min() == util[:, col].max():
+    return row, col
+  return None
+
+def pure_strategies(shape : tuple[int, int], row : int, col : int
+                    ) -> tuple[Strategy, Strategy]:
+  strat1 = np.zeros(shape[0])
+  strat2 = np.zeros(shape[1])
+  strat1[row] = 1
+  strat2[col] = 1
+  return strat1, strat2
+
+def solve_zero_sum(util : np.ndarray) -> tuple[Strategy, Strategy]:
+  """Find minimax (Nash equilibrium) strategies for zero-sum game with
+  utility matrix `util` for player 1 (rows)."""
+  num_rows, num_cols = util.shape
+  saddle = saddle_point(util)
+  if saddle is not None:
+    return pure_strategies(util.shape, *saddle)
+
+  if num_rows == 2 and num_cols == 2:
+    # No saddle point, so both players mix so as to make the other indifferent.
+    (a, b), (c, d) = util
+    denom = a - b - c + d
+    p = (d - c) / denom
+    q = (d - b) / denom
+    return np.array([p, 1 - p]), np.array([q, 1 - q])
+
+  return _simplex_zero_sum(util)
+
+def _simplex_zero_sum(util : np.ndarray) -> tuple[Strategy, Strategy]:
+  """Solve zero-sum game with the simplex method (on a dense tableau).
+
+  After shifting `util` so that all entries are positive (which doesn't
+  change the strategies), player 2's problem is: maximize sum(y) such that
+  util @ y <= 1 and y >= 0. Then value = 1 / sum(y), strat2 = y * value and
+  strat1 comes from the duals (reduced costs of the slack variables).
+
+  This is much faster than scipy's linprog for the tiny games here, which is
+  dominated by setup overhead."""
+  eps = 1e-12
+  num_rows, num_cols = util.shape
+  # Tableau: [util + shift | identity (slacks) | rhs] with objective row last.
+  tab = np.zeros((num_rows + 1, num_cols + num_rows + 1))
+  tab[:num_rows, :num_cols] = util + (1 - util.min())
+  for i in range(num_rows):
+    tab[i, num_cols + i] = 1
+    tab[i, -1] = 1
+  tab[num_rows, :num_cols] = -1
+  basis = np.arange(num_cols, num_cols + num_rows)
+  while True:
+    # Bland's rule (lowest index entering and leaving variables) so that we
+    # cannot cycle on degenerate games (which are common here).
+    col = -1
+    for j in range(num_cols + num_rows):
+      if tab[num_rows, j] < -eps:
+        col = j
+        break
+    if col < 0:
+      break
+    row = -1
+    best = 0.
+    for i in range(num_rows):
+      if tab[i, col] > eps:
+        ratio = tab[i, -1] / tab[i, col]
+        if (row < 0 or ratio < best - eps or
+            (ratio <= best + eps and basis[i] < basis[row])):
+          row = i
+          best = ratio
+    # Pivot
+    tab[row] /= tab[row, col]
+    for i in range(num_rows + 1):
+      if i != row and tab[i, col] != 0:
+        tab[i] -= tab[i, col] * tab[row]
+    basis[row] = col
+
+  value = 1 / tab[num_rows, -1]
+  strat1 = tab[num_rows, num_cols:num_cols + num_rows] * value
+  strat2 = np.zeros(num_cols)
+  for i in range(num_rows):
+    if basis[i] < num_cols:
+      strat2[basis[i]] = tab[i, -1] * value
+  return strat1, strat2
+
+if numba:
+  _simplex_zero_sum = numba.njit(cache=True)(_simplex_zero_sum)
+
+
 def evaluate(state : State) -> StrategyNode:
+  # The game is symmetric, so swapping players negates value (and transposes
+  # utility). Only evaluate (and cache) one of each pair of swapped states.
+  if state.hand2.data < state.hand1.data:
+    node = _evaluate(State(state.hand2, state.hand1))
+    return StrategyNode(-node.value,
+                        None if node.util is None else -node.util.T,
+                        node.strat2, node.strat1)
+  return _evaluate(state)
+
+@functools.cache
+def _evaluate(state : State) -> StrategyNode:
   # All possible moves/cards for each player.
   moves1 = list(state.hand1.unique_cards())
   moves2 = list(state.hand2.unique_cards())
@@ -105,26 +259,45 @@ def evaluate(state : State) -> StrategyNode:
 
   # Recursively evaluate all moves from this state and create a utility matrix.
   # Utility matrix. util[card1][card2] = payout for player 1 when playing that move.
-  util = [[evaluate(play(state, Move(card1, card2))).value
-           for card2 in moves2]
-          for card1 in moves1]
-  game = nashpy.Game(np.array(util))
+  # Each hand minus the card played is shared across a whole row (column).
+  rest1 = [state.hand1.remove(card1) for card1 in moves1]
+  rest2 = [state.hand2.remove(card2) for card2 in moves2]
+  util = np.empty((len(moves1), len(moves2)))
+  for i, card1 in enumerate(moves1):
+    for j, card2 in enumerate(moves2):
+      if card1 > card2:
+        next_state = State(rest1[i].add(card2), rest2[j])
+      elif card2 > card1:
+        next_state = State(rest1[i], rest2[j].add(card1))
+      else:
+        next_state = State(rest1[i], rest2[j])
+      util[i, j] = evaluate(next_state).value
 
   # Since this is a zero-sum game, there is only one Nash equilibrium and it is the minimax result.
-  best_strat1, best_strat2 = list(game.linear_program())
+  saddle = saddle_point(util)
+  if saddle is not None:
+    # Common and cheap to check, so do it before pruning.
+    best_strat1, best_strat2 = pure_strategies(util.shape, *saddle)
+  else:
+    # Solve the game without dominated moves and extend strategies with zeros.
+    rows, cols = prune_dominated(util)
+    strat1, strat2 = solve_zero_sum(util[np.ix_(rows, cols)])
+    best_strat1 = np.zeros(len(moves1))
+    best_strat2 = np.zeros(len(moves2))
+    best_strat1[rows] = strat1
+    best_strat2[cols] = strat2
 
   # We ignore payout for player 2 which is just -payout1
-  payout1 : Value = game[best_strat1, best_strat2][0]
+  payout1 : Value = best_strat1 @ util @ best_strat2
 
   # print()
   # print(state)
   # print(util)
-  # print(game)
-  # print(nash_eq)
+  # print(best_strat1, best_strat2)
   # print(payout1)
   # print()
 
-  return StrategyNode(payout1, game, best_strat1, best_strat2)
+  return StrategyNode(payout1, util, best_strat1, best_strat2)
 
 
 def full_game(n : int) -> StrategyNode:
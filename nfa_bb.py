@@ -5,30 +5,46 @@ Based on question from Discord:
 I'm investigating specifically the unary case here.
 """
 
-from collections.abc import Iterable, Iterator
+from collections.abc import Iterable, Iterator, Sequence
 import string
 import time
 
 
 State = int
-StateSet = frozenset[State]
+# Set of states as a bitmask: state s is in the set iff bit s is set.
+StateSet = int
+
+def make_set(states : Iterable[State]) -> StateSet:
+  result = 0
+  for s in states:
+    result |= 1 << s
+  return result
+
+def states_of(states : StateSet) -> Iterator[State]:
+  """Iterate through states in set in increasing order."""
+  while states:
+    low = states & -states
+    yield low.bit_length() - 1
+    states ^= low
 
 def state_str(state : State):
   return string.ascii_uppercase[state]
 def states_str(states : StateSet):
-  return "".join(state_str(s) for s in sorted(states))
+  return "".join(state_str(s) for s in states_of(states))
 
 class NFA:
-  def __init__(self, start_state : StateSet, trans : list[StateSet]):
+  def __init__(self, start_state : StateSet, trans : Sequence[StateSet]):
     self.start_state = start_state
     self.trans = trans
 
-  def step(self, state : StateSet):
-    if state:
-      return frozenset.union(*[self.trans[x] for x in state])
-    else:
-      # Empty -> Empty
-      return frozenset()
+  def step(self, state : StateSet) -> StateSet:
+    # Union of transitions from all states in set (Empty -> Empty).
+    result = 0
+    while state:
+      low = state & -state
+      result |= self.trans[low.bit_length() - 1]
+      state ^= low
+    return result
 
   def __repr__(self):
     trans_str = " ".join(f"{state_str(state_in)}->{states_str(states_out)}"
@@ -36,58 +52,80 @@ class NFA:
     return f"NFA[Start->{states_str(self.start_state)}  {trans_str}]"
 
 
-def sim_nfa(nfa : NFA) -> list[StateSet]:
-  """Simulate nfa on unary tape until states reach a cycle (at which point they will repeat forever). Return path of states (each is really a list of reachable base states) reached at each step until the cycle starts."""
-  state = nfa.start_state
-  visited = set()
-  path = []
-  while state not in visited:
-    path.append(state)
-    visited.add(state)
-    state = nfa.step(state)
-  return path
-
-
 def is_superset(x : StateSet, ys : Iterable[StateSet]) -> bool:
+  """Is x a superset of any of ys?"""
   for y in ys:
-    if x.issuperset(y):
+    if (x | y) == x:
       return True
   return False
 
-def score_path(path : list[StateSet]) -> int:
-  """Find latest step we can first reject. This is the largest index (n) such that path[n] is not a superset of any path[k] for k < n."""
+def score_nfa(nfa : NFA) -> int:
+  """Simulate nfa on unary tape until states reach a cycle (at which point they will repeat forever).
+  Return latest step we can first reject. This is the largest step (n) such that the states at step n are not a superset of the states at any step k < n."""
+  state = nfa.start_state
+  # States at each step so far (in order) and as a set.
+  path : list[StateSet] = []
   visited : set[StateSet] = set()
-  for n, state in enumerate(path):
-    if not is_superset(state, visited):
-      best = n
+  while state not in visited:
+    if not is_superset(state, path):
+      best = len(path)
+      if not state:
+        # Empty -> Empty forever (and Empty is a subset of everything).
+        return best
+    path.append(state)
     visited.add(state)
+    state = nfa.step(state)
   return best
 
 
-def enum_subsets(a : int, b : int) -> Iterator[StateSet]:
+def enum_subsets(size : int) -> Iterator[StateSet]:
   """Enumerate all subsets of range(size)."""
-  if a == b:
-    yield frozenset()
-  else:
-    for sub in enum_subsets(a+1, b):
-      yield sub
-      yield frozenset([a]) | sub
-
-def enum_subset_lists(size : int, count : int) -> Iterator[list[StateSet]]:
-  """Enumerate all sequences of count subsets of range(size)."""
-  if count == 0:
-    yield []
+  return iter(range(1 << size))
+
+def enum_canonical_trans(num_states : int, num_start : int, num_seen : int,
+                         prefix : list[StateSet] | None = None
+                         ) -> Iterator[list[StateSet]]:
+  """Enumerate transition tables (extending `prefix`) for NFAs with start
+  states range(num_start) in canonical form:
+    * Start states are sorted by start_key() of their transitions.
+    * Numbering states in BFS order from the start states (processing states
+      in increasing order and discovering new states in increasing order)
+      gives the identity permutation.
+  Every NFA can be relabeled into this form (sort start states, then BFS), so
+  this skips many NFAs that are just relabelings of each other.
+
+  num_seen = number of states discovered so far (they are range(num_seen))."""
+  if prefix is None:
+    prefix = []
+  state = len(prefix)
+  if state == num_states:
+    yield prefix
+  elif state >= num_seen:
+    # Remaining states are unreachable, so their transitions never matter.
+    yield prefix + [0] * (num_states - state)
   else:
-    for sub in enum_subset_lists(size, count - 1):
-      for new in enum_subsets(0, size):
-        yield sub + [new]
+    start_mask = (1 << num_start) - 1
+    def start_key(trans : StateSet) -> tuple[int, int]:
+      # Number of start and non-start states we transition to. Unchanged by
+      # relabeling start states among themselves (or other states likewise).
+      return ((trans & start_mask).bit_count(), (trans >> num_start).bit_count())
+    min_key = start_key(prefix[-1]) if 0 < state < num_start else (0, 0)
+    # Newly discovered states must be the next ones in order:
+    # num_seen, num_seen + 1, ..., num_seen + num_new - 1.
+    for num_new in range(num_states - num_seen + 1):
+      new = ((1 << num_new) - 1) << num_seen
+      for old in enum_subsets(num_seen):
+        trans = old | new
+        if start_key(trans) >= min_key:
+          yield from enum_canonical_trans(num_states, num_start,
+                                          num_seen + num_new, prefix + [trans])
 
 def enum_nfas(num_states : int) -> Iterator[NFA]:
   # All NFAs can be normalized so all start states are at beginning.
   # So we can restrict our consideration to NFAs with start states [0, n] for all n
   for start_size in range(1, num_states + 1):
-    start = frozenset(range(start_size))
-    for trans in enum_subset_lists(num_states, num_states):
+    start = make_set(range(start_size))
+    for trans in enum_canonical_trans(num_states, start_size, start_size):
       yield NFA(start, trans)
 
 
@@ -95,8 +133,7 @@ def search(num_states : int):
   max_score = -1
   best_nfa = None
   for nfa in enum_nfas(num_states):
-    path = sim_nfa(nfa)
-    score = score_path(path)
+    score = score_nfa(nfa)
     if score > max_score:
       if score > num_states:
         print(f"   {score:3d} {repr(nfa):40s} ({time.process_time():6.1f}s)")
@@ -106,17 +143,17 @@ def search(num_states : int):
 
 
 def main():
-  champ = NFA(frozenset([0,3]), [
-    frozenset([1]),
-    frozenset([2]),
-    frozenset([0]),
-
-    frozenset([4]),
-    frozenset([5]),
-    frozenset([6]),
-    frozenset([3]),
+  champ = NFA(make_set([0,3]), [
+    make_set([1]),
+    make_set([2]),
+    make_set([0]),
+
+    make_set([4]),
+    make_set([5]),
+    make_set([6]),
+    make_set([3]),
   ])
-  score = score_path(sim_nfa(champ))
+  score = score_nfa(champ)
   print(f"Champ 7: {score} {repr(champ)}")
 
   for num_states in range(1, 7):
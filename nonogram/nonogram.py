@@ -1,6 +1,9 @@
 # Exploration of Nonogram solvers, combinatorics, etc.
 
 import collections
+import functools
+import itertools
+import math
 
 
 class NoSolution(Exception):
@@ -19,6 +22,9 @@ class Grid:
       # First index row, second index col.
       # Initialized to all UNKNOWN since we don't know color yet.
       self.grid = [[UNKNOWN for _ in range(num_cols)] for _ in range(num_rows)]
+    # Same cells, but first index col, second index row. Kept in sync with
+    # grid so that reading a column doesn't need to gather it from every row.
+    self.cols = [list(col) for col in zip(*self.grid)]
 
   def GetLine(self, direction, index):
     if direction == 0:
@@ -27,15 +33,18 @@ class Grid:
     else:
       assert direction == 1
       # Column
-      return [row[index] for row in self.grid]
+      return self.cols[index]
 
   def SetLine(self, direction, index, line):
     if direction == 0:
       # Row
       self.grid[index] = line
+      for i, col in enumerate(self.cols):
+        col[index] = line[i]
     else:
       assert direction == 1
       # Column
+      self.cols[index] = line
       for i, row in enumerate(self.grid):
         row[index] = line[i]
 
@@ -47,8 +56,8 @@ class Grid:
       yield row
 
   def EnumCols(self):
-    for index in range(len(self.grid[0])):
-      yield [row[index] for row in self.grid]
+    for col in self.cols:
+      yield col
 
   def __str__(self):
     return "\n".join("".join(row) for row in self.grid)
@@ -77,77 +86,155 @@ class Nonogram:
 
 
 # Solvers
-def EnumLines(spec, line_len):
-  if line_len < 0:
-    # Illegal, no options.
-    return
-
-  if len(spec) == 0:
-    yield [BLANK] * line_len
-    return
-
-  for first_index in range(line_len - spec[0]):
-    prefix = [BLANK] * first_index + [FULL] * spec[0] + [BLANK]
-    for sub in EnumLines(spec[1:], line_len - len(prefix)):
-      yield prefix + sub
-
-  # Last run in spec can end exactly at end of line without extra 0 at end.
-  if len(spec) == 1 and spec[0] <= line_len:
-    first_index = line_len - spec[0]
-    yield [BLANK] * first_index + [FULL] * spec[0]
-
-def MatchesLine(new_line, old_line):
-  assert len(new_line) == len(old_line)
-  for i in range(len(old_line)):
-    if old_line[i] != UNKNOWN and new_line[i] != old_line[i]:
-      return False
-  return True
-
-def UpdateLine(spec, old_line):
-  pos_lines = [line for line in EnumLines(spec, len(old_line))
-               if MatchesLine(line, old_line)]
-  if len(pos_lines) == 0:
+# Lines are represented in the solvers as bitmasks (bit i = cell i).
+def LineMasks(line):
+  """Bitmasks of cells in line which are known to be FULL and BLANK."""
+  full = blank = 0
+  for i, cell in enumerate(line):
+    if cell == FULL:
+      full |= 1 << i
+    elif cell == BLANK:
+      blank |= 1 << i
+  return full, blank
+
+def MinLens(spec):
+  """Minimum length needed for spec[i:] for each i."""
+  min_lens = [0] * (len(spec) + 1)
+  for i in reversed(range(len(spec))):
+    min_lens[i] = spec[i] + min_lens[i + 1] + (1 if i + 1 < len(spec) else 0)
+  return min_lens
+
+# Only compile EnumLines for lines with at least this many placements (before
+# considering known cells), otherwise compiling costs more than it saves.
+kCompileMinPlacements = 1000
+
+def EnumLines(spec, line_len, full=0, blank=0):
+  """Enumerate all lines (as bitmasks of FULL cells) of length line_len
+  matching spec which are consistent with known full and blank cells."""
+  min_lens = MinLens(spec)
+  if (line_len >= min_lens[0] and
+      math.comb(line_len - min_lens[0] + len(spec), len(spec)) >= kCompileMinPlacements):
+    enum = CompileEnumLines(tuple(spec), line_len)
+    if enum:
+      return enum(full, blank)
+
+  def Place(i, start, prefix):
+    """Place runs spec[i:] starting at cell start or later."""
+    if i == len(spec):
+      # All remaining cells are blank.
+      if not full >> start:
+        yield prefix
+      return
+    run_len = spec[i]
+    for pos in range(start, line_len - min_lens[i] + 1):
+      run = ((1 << run_len) - 1) << pos
+      # Run must not cover known blanks and the cell after it must be blank.
+      if not run & blank and not (full >> (pos + run_len)) & 1:
+        yield from Place(i + 1, pos + run_len + 1, prefix | run)
+      if (full >> pos) & 1:
+        # Cell pos would be left blank by any later placement.
+        break
+
+  return Place(0, 0, 0)
+
+def EnumLinesSource(spec, line_len):
+  """Return Python source for generator function
+    _enum(full, blank)
+  equivalent to EnumLines(spec, line_len, full, blank) with the recursion over
+  runs unrolled into a loop nest (one loop per run) using literal constants."""
+  min_lens = MinLens(spec)
+  lines = ["def _enum(full, blank):"]
+  indent = 1
+  def emit(line):
+    lines.append("  " * indent + line)
+
+  start, prefix = "0", "0"
+  for i, run_len in enumerate(spec):
+    # After the last run, all remaining cells must be blank, otherwise just
+    # the one after this run.
+    after = f"full >> (p{i} + {run_len})"
+    if i + 1 < len(spec):
+      after = f"({after}) & 1"
+    emit(f"for p{i} in range({start}, {line_len - min_lens[i] + 1}):")
+    indent += 1
+    emit(f"m{i} = {prefix} | ({(1 << run_len) - 1} << p{i})")
+    emit(f"if not m{i} & blank and not {after}:")
+    indent += 1
+    start, prefix = f"p{i} + {run_len + 1}", f"m{i}"
+  if spec:
+    emit(f"yield {prefix}")
+  else:
+    emit("if not full: yield 0")
+  for i in reversed(range(len(spec))):
+    indent -= 1
+    # Cell p_i would be left blank by any later placement.
+    emit(f"if (full >> p{i}) & 1: break")
+    indent -= 1
+  return "\n".join(lines) + "\n"
+
+@functools.lru_cache(maxsize=None)
+def CompileEnumLines(spec, line_len):
+  """Compile EnumLines for spec into a Python function (see EnumLinesSource).
+
+  Returns None if spec has too many runs for the Python compiler to nest."""
+  try:
+    code = compile(EnumLinesSource(spec, line_len), f"<EnumLines {spec} {line_len}>", "exec")
+  except SyntaxError:
+    return None
+  namespace = {}
+  exec(code, namespace)
+  return namespace["_enum"]
+
+@functools.lru_cache(maxsize=None)
+def UpdateLineMasks(spec, line_len, full, blank):
+  """Find all cells forced by spec given known full and blank cells.
+  Returns new (full, blank) masks. Cached since the same lines come up
+  repeatedly while solving (and across puzzles)."""
+  # Cells which are FULL in all / any possible lines.
+  all_full = (1 << line_len) - 1
+  any_full = 0
+  found = False
+  for line in EnumLines(spec, line_len, full, blank):
+    found = True
+    all_full &= line
+    any_full |= line
+    if all_full == full and any_full | blank == (1 << line_len) - 1:
+      # We can't learn anything new about this line.
+      break
+  if not found:
     raise NoSolution
+  return all_full, ((1 << line_len) - 1) & ~any_full
 
+def UpdateLine(spec, old_line):
+  full, blank = UpdateLineMasks(tuple(spec), len(old_line), *LineMasks(old_line))
   new_line = [UNKNOWN for _ in range(len(old_line))]
   for index in range(len(old_line)):
-    pos_cell = set(line[index] for line in pos_lines)
-    if len(pos_cell) == 1:
-      new_line[index] = pos_cell.pop()
+    if (full >> index) & 1:
+      new_line[index] = FULL
+    elif (blank >> index) & 1:
+      new_line[index] = BLANK
   return new_line
 
 def LineSolve(nono):
   """Refine a Nonogram by iteratively line solving each line."""
-  was_modified = True
-  while was_modified:
-    was_modified = False
+  # Lines which need to be (re-)solved in each direction. A line can only
+  # learn something new if a cell in it changed since we last solved it.
+  todo = [set(range(nono.GetDim(direction))) for direction in range(2)]
+  while todo[0] or todo[1]:
     for direction in range(2):
-      for index in range(nono.GetDim(direction)):
+      for index in sorted(todo[direction]):
         spec, line = nono.GetLine(direction, index)
         new_line = UpdateLine(spec, line)
         if new_line != line:
-          was_modified = True
           nono.SetLine(direction, index, new_line)
+          for cell_index in range(len(line)):
+            if new_line[cell_index] != line[cell_index]:
+              todo[1 - direction].add(cell_index)
+      todo[direction].clear()
   return nono
 
 
 # Enumerate puzzles
-def EnumAllRows(length):
-  if length == 0:
-    yield []
-  else:
-    for sub in EnumAllRows(length - 1):
-      for cell in [BLANK, FULL]:
-        yield sub + [cell]
-
-def EnumAllGrids(num_rows, num_cols):
-  if num_rows == 0:
-    yield []
-  else:
-    for sub in EnumAllGrids(num_rows - 1, num_cols):
-      for row in EnumAllRows(num_cols):
-        yield sub + [row]
-
 def Line2Spec(line):
   spec = []
   chunk = 0
@@ -169,14 +256,54 @@ def Grid2Spec(grid):
   return (row_specs, col_specs)
 
 
+def Mask2Line(mask, length):
+  """Line written out as binary number mask (first cell is highest bit)."""
+  return [FULL if (mask >> (length - 1 - i)) & 1 else BLANK
+          for i in range(length)]
+
 def ListNonograms(num_rows, num_cols):
   """Count number of valid Nonograms with specific dimentions."""
-  specs_count = collections.Counter()
-  for grid in EnumAllGrids(num_rows, num_cols):
-    grid = Grid(grid=grid)
-    spec = Grid2Spec(grid)
-    specs_count[spec] += 1
-  return [spec for spec, count in specs_count.items() if count == 1]
+  # Grids are enumerated as a mask for each row (see Mask2Line). Each grid is
+  # counted by one int packing canonical masks for all its rows and columns
+  # (masks with the same spec share a canonical mask), which is much cheaper
+  # than building grids and their specs.
+  row_specs = [Line2Spec(Mask2Line(mask, num_cols))
+               for mask in range(1 << num_cols)]
+  col_specs = [Line2Spec(Mask2Line(mask, num_rows))
+               for mask in range(1 << num_rows)]
+  # Canonical mask for each spec, so that masks with same spec count together.
+  row_canon = [row_specs.index(spec) for spec in row_specs]
+  col_canon = [col_specs.index(spec) for spec in col_specs]
+  # Column masks are packed into one int (num_rows bits per column).
+  # spread[row] = contribution of row (before shifting by its position).
+  spread = [sum(1 << (col * num_rows)
+                for col in range(num_cols) if (row >> (num_cols - 1 - col)) & 1)
+            for row in range(1 << num_cols)]
+  row_mask = (1 << num_cols) - 1
+  col_mask = (1 << num_rows) - 1
+  col_shifts = [col * num_rows for col in range(num_cols)]
+
+  masks_count = collections.Counter()
+  for rows in itertools.product(range(1 << num_cols), repeat=num_rows):
+    key = cols = 0
+    for row in rows:
+      cols = (cols << 1) | spread[row]
+      key = (key << num_cols) | row_canon[row]
+    for shift in col_shifts:
+      key = (key << num_rows) | col_canon[(cols >> shift) & col_mask]
+    masks_count[key] += 1
+
+  def Unpack(key):
+    cols = []
+    for _ in range(num_cols):
+      cols.append(col_specs[key & col_mask])
+      key >>= num_rows
+    rows = []
+    for _ in range(num_rows):
+      rows.append(row_specs[key & row_mask])
+      key >>= num_cols
+    return (tuple(reversed(rows)), tuple(reversed(cols)))
+  return [Unpack(key) for key, count in masks_count.items() if count == 1]
 
 
 # Number of square Nonograms (which can be solved uniquely).
@@ -29,23 +29,26 @@ class Tree:
   def num_positions(self):
     return len(self.children)
 
-  def _walk_help(self, visited, pos):
-    if pos not in visited:
-      visited.add(pos)
-      # 1) Yield all descendants
-      for next_pos in self.children[pos]:
-        for p in self._walk_help(visited, next_pos):
-          yield p
-      # 2) Yield self
-      yield pos
-
   def walk_back(self):
     """Enumerate all postitions in the game tree backwards, starting from leaf
     nodes. You are guaranteed that you will only see a position after all of
     it's children."""
-    visited = set()
-    for pos in self._walk_help(visited, self.init_pos):
-      yield pos, self.children[pos]
+    # Depth first search (post-order) using an explicit stack of
+    # (pos, iterator over its remaining children).
+    visited = {self.init_pos}
+    stack = [(self.init_pos, iter(self.children[self.init_pos]))]
+    while stack:
+      pos, children_iter = stack[-1]
+      for next_pos in children_iter:
+        if next_pos not in visited:
+          # 1) Yield all descendants (before continuing with this pos).
+          visited.add(next_pos)
+          stack.append((next_pos, iter(self.children[next_pos])))
+          break
+      else:
+        # 2) Yield self
+        stack.pop()
+        yield pos, self.children[pos]
 
 
 def num_games(tree):
@@ -55,9 +58,8 @@ def num_games(tree):
       # If there are no following moves, this is a single completed game trace.
       num_subgames[pos] = 1
     else:
-      # Otherwise, add up all the following counts.
-      # Note: This is inefficient because it's not memoized ... but I think it
-      # doesn't matter for tic-tac-toe b/c it's small enough ...
+      # Otherwise, add up all the following counts. walk_back() gives us all
+      # children first, so this is computed once per position (not per game).
       num_subgames[pos] = sum(num_subgames[next_pos] for next_pos in children)
   return num_subgames[tree.init_pos]
 
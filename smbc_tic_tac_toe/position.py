@@ -8,15 +8,20 @@ Exports simple interface:
  * other_player(player : Player) -> Player
  * eval_pos(pos : Position) -> Player or None
  * list_moves(pos : Position) -> list(Position)
+
+Positions are ints (so they are cheap to hash and compare):
+ * bits 0-8: cells with an X (cell index = 3*row + col)
+ * bits 9-17: cells with an O
+ * bit 18: set if it's O's turn
 """
 
 players = ["X", "O"]
-_kBlank = "."
-init_pos = (_kBlank * 9, "X")
+_kAllCells = (1 << 9) - 1
+_kOTurn = 1 << 18
+init_pos = 0
 
 def get_player(pos):
-  board, player = pos
-  return player
+  return "O" if pos & _kOTurn else "X"
 
 def other_player(player):
   _kOtherPlayer = {"X" : "O", "O": "X"}
@@ -27,32 +32,28 @@ _kWinPatterns = (
   [[c + 3*r for r in range(3)] for c in range(3)] +  # Cols
   [[0, 4, 8], [2, 4, 6]]  # Diagonals
 )
+_kWinMasks = [sum(1 << loc for loc in locs) for locs in _kWinPatterns]
+# _kIsWin[cells] = whether a player with these cells has won.
+_kIsWin = [any(cells & mask == mask for mask in _kWinMasks)
+           for cells in range(_kAllCells + 1)]
 def eval_pos(pos):
   """Evalutate the position to see if it's a game over and who won.
   Returns winning player (or None if nobody has won). Note: Assumes valid
   position, i.e. no pos with two different winners!"""
-  board, player = pos
-  for locs in _kWinPatterns:
-    vals = set(board[loc] for loc in locs)
-    if len(vals) == 1:
-      val = vals.pop()
-      if val != _kBlank:
-        return val
+  if _kIsWin[pos & _kAllCells]:
+    return "X"
+  if _kIsWin[(pos >> 9) & _kAllCells]:
+    return "O"
   return None
 
-def _move(old_board : str, index : int, player : str) -> str:
-  assert old_board[index] == _kBlank
-  new_board = list(old_board)
-  new_board[index] = player
-  return "".join(new_board)
-
 def list_moves(pos):
   """List following positions. Note: Only call this for positions that are not
   already won. It does not check for pos being already won."""
-  board, player = pos
+  shift = 9 if pos & _kOTurn else 0
+  empty = ~(pos | (pos >> 9)) & _kAllCells
   new_poses = []
-  for i, cell in enumerate(board):
-    if cell == _kBlank:
-      new_board = _move(board, i, player)
-      new_poses.append((new_board, other_player(player)))
+  while empty:
+    cell = empty & -empty
+    new_poses.append((pos | (cell << shift)) ^ _kOTurn)
+    empty ^= cell
   return new_poses
@@ -1,36 +1,50 @@
 class State:
-  def __init__(self, friends, enemies):
-    self.friends = friends
-    self.enemies = enemies
+  """One team during a battle. Pets are stored as parallel lists of their
+  fields (struct of arrays) rather than as Pet objects, so that we don't need
+  to copy Pets for every battle."""
+  def __init__(self, team):
+    self.names = [pet.name for pet in team]
+    self.attack = [pet.attack for pet in team]
+    self.health = [pet.health for pet in team]
+    self.triggers = [pet.triggers for pet in team]
+    # Set to the opposing State by battle().
+    self.enemies = None
     self.trigger_queue = []
 
   def __str__(self):
-    return " ".join(str(pet) for pet in self.friends)
+    return " ".join(f"{name}:{attack}/{health}" for name, attack, health
+                    in zip(self.names, self.attack, self.health))
 
   def start_battle(self):
-    for i, pet in enumerate(self.friends):
-      if "start_battle" in pet.triggers:
-        self.trigger_queue.append((pet.triggers["start_battle"], i))
+    for i, triggers in enumerate(self.triggers):
+      action = triggers.get("start_battle")
+      if action:
+        self.trigger_queue.append((action, i))
 
   def apply_attack(self):
-    damage = self.enemies[0].attack
+    damage = self.enemies.attack[0]
     # TODO: Shield
-    #print(" - Pre-damage:", damage, self.friends[0])
-    self.friends[0].health -= damage
-    #print(" - Post-damage:", self.friends[0])
+    self.health[0] -= damage
     # TODO: Trigger hurt (if not dead).
 
   def apply_feints(self):
     """See if anyone feinted and remove them."""
+    if not self.health or min(self.health) > 0:
+      # Common case: Nobody feinted.
+      return
     feint_indexes = []
-    for i, pet in enumerate(self.friends):
-      if pet.health <= 0:
+    for i, health in enumerate(self.health):
+      if health <= 0:
         feint_indexes.append(i)
-        if "feint" in pet.triggers:
-          self.trigger_queue.append((pet.triggers["feint"], i))
+        action = self.triggers[i].get("feint")
+        if action:
+          self.trigger_queue.append((action, i))
     # We have to delete in reverse order so that indexes remain valid.
     for i in reversed(feint_indexes):
-      del self.friends[i]
+      del self.names[i]
+      del self.attack[i]
+      del self.health[i]
+      del self.triggers[i]
 
   def apply_triggers(self):
     for (action, trigger_loc) in self.trigger_queue:
@@ -53,11 +67,14 @@ class State:
   def apply_trigger_summon(self, pet, trigger_loc):
     # TODO: These locs might be invalidated if there's multiple summon triggers in the queue at the same time ...
     # TODO: Check that we are not adding too many friends (max 5).
-    self.friends.insert(trigger_loc, pet)
-    for other_pet in self.friends:
-      if "friend_summon" in other_pet.triggers:
-        self.trigger_queue.append((other_pet.triggers["friend_summon"],
-                                   trigger_loc))
+    self.names.insert(trigger_loc, pet.name)
+    self.attack.insert(trigger_loc, pet.attack)
+    self.health.insert(trigger_loc, pet.health)
+    self.triggers.insert(trigger_loc, pet.triggers)
+    for triggers in self.triggers:
+      action = triggers.get("friend_summon")
+      if action:
+        self.trigger_queue.append((action, trigger_loc))
 
   def apply_trigger_boost(self, where, count, boost_attack, boost_health,
                           trigger_loc):
@@ -66,7 +83,7 @@ class State:
       targets = [trigger_loc]
     elif where == "random_friend":
       # If there aren't enough friends, some reps will fizzle.
-      count = min(count, len(self.friends))
+      count = min(count, len(self.health))
       # TODO: Explore all possible target combinations.
       # For right now we just always target the first pets in line.
       targets = list(range(count))
@@ -74,13 +91,13 @@ class State:
       raise Exception(where)
 
     for target in targets:
-      self.friends[target].attack += boost_attack
-      self.friends[target].health += boost_health
+      self.attack[target] += boost_attack
+      self.health[target] += boost_health
 
   def apply_trigger_damage(self, where, count, damage_amount, trigger_loc):
     if where == "random_enemy":
       # If there aren't enough friends, some reps will fizzle.
-      count = min(count, len(self.enemies))
+      count = min(count, len(self.enemies.health))
       # TODO: Explore all possible target combinations.
       # For right now we just always target the first pets in line.
       targets = list(range(count))
@@ -89,7 +106,7 @@ class State:
 
     for target in targets:
       # TODO: Shield, trigger hurt, etc.
-      self.enemies[target].health -= damage_amount
+      self.enemies.health[target] -= damage_amount
 
 
 class BattleResult:
@@ -101,6 +118,10 @@ class BattleResult:
   def __str__(self):
     return f"{self.win:.2f} Win, {self.tie:.2f} Tie, {self.lose:.2f} Lose"
 
+  def flip(self):
+    """Result from the point of view of the other team."""
+    return BattleResult(win=self.lose, tie=self.tie, lose=self.win)
+
 Win  = BattleResult(1, 0, 0)
 Tie  = BattleResult(0, 1, 0)
 Lose = BattleResult(0, 0, 1)
@@ -116,13 +137,14 @@ def resolve_triggers(states):
       state.apply_feints()
 
 def battle(team_a, team_b, verbose=False):
-  # Make copies so that we don't modify the passed in teams.
-  team_a = team_a.copy()
-  team_b = team_b.copy()
-  states = [
-    State(team_a, team_b),
-    State(team_b, team_a),
-  ]
+  # States are built from (not sharing) the teams, so the passed in teams
+  # are not modified.
+  states = [State(team_a), State(team_b)]
+  states[0].enemies = states[1]
+  states[1].enemies = states[0]
+  # Pets left on each team.
+  team_a = states[0].health
+  team_b = states[1].health
 
   for state in states:
     state.start_battle()
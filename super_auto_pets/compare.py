@@ -1,19 +1,72 @@
+import concurrent.futures
+import os
+
 import numpy
 
 import battle
 import util
 
 
-def round_robin(teams):
-  """Perform round-robin tournament amont collection of teams and return outcomes."""
-  # outcomes[i][j] is the result of teams[i] vs. teams[j]
-  outcomes = []
-  for team_a in teams:
-    outcomes_a = []
-    for team_b in teams:
-      outcomes_a.append(battle.battle(team_a, team_b))
-    outcomes.append(outcomes_a)
-  return outcomes
+def team_key(team):
+  """Hashable key which determines how a team battles."""
+  return tuple((pet.name, pet.attack, pet.health) for pet in team)
+
+# Map (team_key(team_a), team_key(team_b)) -> battle.battle(team_a, team_b)
+_battle_cache = {}
+
+def cached_battle(team_a, team_b, key_a=None, key_b=None):
+  """battle.battle(team_a, team_b), but only simulated once for each pair of
+  teams. Battles are symmetric, so this also caches team_b vs. team_a."""
+  if key_a is None:
+    key_a = team_key(team_a)
+  if key_b is None:
+    key_b = team_key(team_b)
+  result = _battle_cache.get((key_a, key_b))
+  if result is None:
+    result = battle.battle(team_a, team_b)
+    _battle_cache[(key_a, key_b)] = result
+    _battle_cache[(key_b, key_a)] = result.flip()
+  return result
+
+def round_robin(teams, num_procs=None):
+  """Perform round-robin tournament amont collection of teams and return outcomes.
+  Outcomes are a BattleResult of matrices: outcomes.win[i, j] is 1 if teams[i]
+  beats teams[j] (and similarly for tie and lose).
+  Battles are simulated in parallel using num_procs processes (default: all CPUs)."""
+  keys = [team_key(team) for team in teams]
+  num_procs = num_procs or os.cpu_count()
+  if num_procs > 1:
+    # Simulate all battles not already in the cache in parallel and add them
+    # to the cache. Teams with the same key (or a pair in the other order)
+    # only need to be simulated once.
+    pairs = {}
+    for i in range(len(teams)):
+      for j in range(i, len(teams)):
+        if ((keys[i], keys[j]) not in _battle_cache and
+            (keys[j], keys[i]) not in pairs):
+          pairs.setdefault((keys[i], keys[j]), (i, j))
+    if pairs:
+      with concurrent.futures.ProcessPoolExecutor(num_procs) as executor:
+        results = executor.map(battle.battle,
+                               [teams[i] for i, _ in pairs.values()],
+                               [teams[j] for _, j in pairs.values()],
+                               chunksize=len(pairs) // (4 * num_procs) + 1)
+        for (key_a, key_b), result in zip(pairs, results):
+          _battle_cache[(key_a, key_b)] = result
+          _battle_cache[(key_b, key_a)] = result.flip()
+
+  # Fill in matrices directly rather than building a BattleResult per pair.
+  win = numpy.zeros((len(teams), len(teams)), dtype=numpy.int8)
+  tie = numpy.zeros((len(teams), len(teams)), dtype=numpy.int8)
+  lose = numpy.zeros((len(teams), len(teams)), dtype=numpy.int8)
+  for i in range(len(teams)):
+    # Battles are symmetric, so only simulate i <= j.
+    for j in range(i, len(teams)):
+      result = cached_battle(teams[i], teams[j], keys[i], keys[j])
+      win[i, j] = lose[j, i] = result.win
+      tie[i, j] = tie[j, i] = result.tie
+      lose[i, j] = win[j, i] = result.lose
+  return battle.BattleResult(win=win, tie=tie, lose=lose)
 
 def min_losses_max_wins_key(result):
   """A comp_key that sorts for minimizing losses (maximizing wins as a tiebreaker)."""
@@ -21,43 +74,32 @@ def min_losses_max_wins_key(result):
 
 def uniform_order(outcomes, comp_key=min_losses_max_wins_key):
   """Order round-robin outcomes by simple strategy by comparing to all possible opponents with equal weight. This is the optimal strategy if your opponent is chosen uniformly at random from the distribution."""
-  sum_outcomes = []
-  for outcomes_a in outcomes:
-    sum_outcomes.append(battle.BattleResult(
-      win  = sum(res.win  for res in outcomes_a),
-      tie  = sum(res.tie  for res in outcomes_a),
-      lose = sum(res.lose for res in outcomes_a)))
+  sum_outcomes = [battle.BattleResult(win=int(win), tie=int(tie), lose=int(lose))
+                  for win, tie, lose in zip(outcomes.win.sum(axis=1),
+                                            outcomes.tie.sum(axis=1),
+                                            outcomes.lose.sum(axis=1))]
   return (util.argsort(sum_outcomes, key=comp_key), sum_outcomes)
 
 
 def gradient_decent(outcomes, num_iterations=100):
   """Attempt to approximate a Nash Equilibrium mixed strategy by gradient decent starting at uniform choise over all teams and moving in the direction of the "optimal response"."""
-  num_teams = len(outcomes)
+  num_teams = len(outcomes.win)
   # Payoff is -1 for a loss, 0 for win or tie.
-  payoff_matrix = numpy.matrix([[res.win-res.lose for res in row]
-                                for row in outcomes])
-  # Build strategy from preferences
-  strategy = numpy.matrix([[1.] for _ in range(num_teams)])
-  # Normalize
-  strategy = numpy.divide(strategy, strategy.sum())
+  payoff_matrix = (outcomes.win - outcomes.lose).astype(numpy.float64)
+  # Start with uniform strategy.
+  strategy = numpy.full(num_teams, 1. / num_teams)
 
   for _ in range(num_iterations):
-    #print("#", _)
     # If opponent uses strategy, what are the payoffs for me for each
     # pure strategy?
-    payoffs = numpy.matmul(payoff_matrix, strategy)
-    max_payoff = max(payoffs)
-    opt_response = numpy.zeros((num_teams, 1))
+    payoffs = payoff_matrix @ strategy
     # Average old strategy with the optimal response.
-    for i in range(num_teams):
-      if payoffs[i, 0] > max_payoff - 0.0001:
-        #print(" .", i)
-        opt_response[i, 0] = 1
+    opt_response = (payoffs > payoffs.max() - 0.0001).astype(numpy.float64)
     # Normalize and make smaller so that it only nudges the solution.
-    opt_response = numpy.divide(opt_response, opt_response.sum() * 10)
+    opt_response /= opt_response.sum() * 10
 
-    strategy = numpy.add(strategy, opt_response)
-    strategy = numpy.divide(strategy, strategy.sum())
+    strategy = strategy + opt_response
+    strategy /= strategy.sum()
 
   return list(strategy.flat)
 
@@ -65,16 +107,15 @@ def nash_equilibrium(outcomes):
   # TODO: This only works if there actually is a complete mixed strategy
   # (using >0 prob for all teams). In reality, we need to check for strategies
   # which use a subset of teams.
-  num_teams = len(outcomes)
+  num_teams = len(outcomes.lose)
   # Payoff is -1 for a loss, 0 for win or tie.
-  payoff_matrix = numpy.matrix([[1 - 2 * res.lose for res in row]
-                                for row in outcomes])
+  payoff_matrix = 1 - 2 * outcomes.lose
   print(payoff_matrix)
   inv_pay_mat = numpy.linalg.inv(payoff_matrix)
   print(inv_pay_mat)
-  nash_strat = numpy.matmul(inv_pay_mat, numpy.ones((num_teams, 1)))
+  nash_strat = inv_pay_mat @ numpy.ones((num_teams, 1))
   print(nash_strat)
-  nash_strat = numpy.divide(nash_strat, nash_strat.sum())
+  nash_strat /= nash_strat.sum()
   return list(nash_strat.flat)
 
 
@@ -83,8 +124,7 @@ if __name__ == "__main__":
 
   ex_teams = teams.example_teams()
   outcomes = round_robin(ex_teams)
-  print(numpy.matrix([[res.win - res.lose for res in row]
-                      for row in outcomes]))
+  print(numpy.matrix(outcomes.win - outcomes.lose))
 
   strategy = gradient_decent(outcomes)
   print(strategy)
@@ -1,77 +1,111 @@
 class Pet:
+  __slots__ = ("name", "attack", "health", "level", "merged_count")
+  # Map from event to action. Same for all pets of a class, so shared by them
+  # (and never modified).
+  triggers = {}
+
   def __init__(self, name, attack, health):
     self.name = name
     self.attack = attack
     self.health = health
     self.level = 1
     self.merged_count = 1
-    self.triggers = {}
 
   def __str__(self):
     return f"{self.name}:{self.attack}/{self.health}"
 
   def copy(self):
-    new_pet = Pet(self.name, self.attack, self.health)
+    # Copy slots directly rather than re-running __init__. This also keeps
+    # the subclass (so copies of an Ant are still Ants).
+    new_pet = object.__new__(type(self))
+    new_pet.name = self.name
+    new_pet.attack = self.attack
+    new_pet.health = self.health
     new_pet.level = self.level
     new_pet.merged_count = self.merged_count
-    new_pet.triggers = self.triggers
     return new_pet
 
+  __copy__ = copy
+
+
+# Tokens (defined first, since pet triggers summon them)
+class CricketToken(Pet):
+  __slots__ = ()
 
+  def __init__(self):
+    super().__init__("CricketToken", 1, 1)
+
+
+# Pets
 class Ant(Pet):
+  __slots__ = ()
+  triggers = {"feint": ("boost", "random_friend", 1, 2, 1)}
+
   def __init__(self):
     super().__init__("Ant", 2, 1)
-    self.triggers["feint"] = ("boost", "random_friend", 1, 2, 1)
 
 class Beaver(Pet):
+  __slots__ = ()
+  triggers = {"sell": ("boost", "random_friend", 2, 0, 2)}
+
   def __init__(self):
     super().__init__("Beaver", 2, 2)
-    self.triggers["sell"] = ("boost", "random_friend", 2, 0, 2)
 
 class Cricket(Pet):
+  __slots__ = ()
+  triggers = {"feint": ("summon", CricketToken)}
+
   def __init__(self):
     super().__init__("Cricket", 1, 2)
-    self.triggers["feint"] = ("summon", CricketToken)
 
 class Duck(Pet):
+  __slots__ = ()
+  triggers = {"sell": ("boost", "all_shop", None, 0, 1)}
+
   def __init__(self):
     super().__init__("Duck", 1, 2)
-    self.triggers["sell"] = ("boost", "all_shop", None, 0, 1)
 
 class Fish(Pet):
+  __slots__ = ()
+  triggers = {"level_up": ("boost", "all_friends", None, 1, 1)}
+
   def __init__(self):
     super().__init__("Fish", 2, 3)
-    self.triggers["level_up"] = ("boost", "all_friends", None, 1, 1)
 
 class Horse(Pet):
+  __slots__ = ()
+  triggers = {"friend_summon": ("boost", "trigger", None, 1, 0)}
+
   def __init__(self):
     super().__init__("Horse", 2, 1)
-    self.triggers["friend_summon"] = ("boost", "trigger", None, 1, 0)
 
 class Mosquito(Pet):
+  __slots__ = ()
+  triggers = {"start_battle": ("damage", "random_enemy", 1, 1)}
+
   def __init__(self):
     super().__init__("Mosquito", 2, 2)
-    self.triggers["start_battle"] = ("damage", "random_enemy", 1, 1)
 
 class Otter(Pet):
+  __slots__ = ()
+  triggers = {"buy": ("boost", "random_friend", 1, 1, 1)}
+
   def __init__(self):
     super().__init__("Otter", 1, 2)
-    self.triggers["buy"] = ("boost", "random_friend", 1, 1, 1)
 
 class Pig(Pet):
+  __slots__ = ()
+  triggers = {"sell": ("gold", +1)}
+
   def __init__(self):
     super().__init__("Pig", 3, 1)
-    self.triggers["sell"] = ("gold", +1)
 
 class Sloth(Pet):
+  __slots__ = ()
+
   def __init__(self):
     super().__init__("Sloth", 1, 1)
 
 all_pet_classes = [Ant, Beaver, Cricket, Duck, Fish,
                    Horse, Mosquito, Otter, Pig, Sloth]
 
-
-# Tokens
-class CricketToken(Pet):
-  def __init__(self):
-    super().__init__("CricketToken", 1, 1)
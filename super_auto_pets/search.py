@@ -2,6 +2,8 @@
 Code to explore optimal play in Super Auto Pets.
 """
 
+import itertools
+
 import numpy
 
 import battle
@@ -44,15 +46,18 @@ def list_round1_teams():
   good_pets = [pets.Ant, pets.Cricket, pets.Fish, pets.Horse, pets.Mosquito,
                pets.Otter]
   # First consider all 3 pet teams (giving bonuses for teams with Horses)
-  for schema in util.cartesian_product(good_pets, 3):
-    team = [pet_class() for pet_class in schema]
+  # Note: Schemas are reversed so that the first pet varies fastest (keeping
+  # the order teams are listed in).
+  for schema in itertools.product(good_pets, repeat=3):
+    team = [pet_class() for pet_class in schema[::-1]]
     team = with_horse_buff(team)
     # TODO: Otter bonus ...
     all_teams.append(team)
   # Second consider all 2 pet teams boosted by:
   #  1) buying and selling a Duck first,
   #  2) selling a Beaver last
-  for schema in util.cartesian_product(good_pets, 2):
+  for schema in itertools.product(good_pets, repeat=2):
+    schema = schema[::-1]
     # Duck boosted
     all_teams.append([boost(pet_class(), 1, 1) for pet_class in schema])
     # Beaver boosted
@@ -78,8 +83,8 @@ def try_all_round1():
   print("Top teams were defeated by:")
   for place, index in enumerate(uniform_order_indexes[:3]):
     print(f" {place+1:3d}  {str(all_teams[index]):s}  defeated by:")
-    for oppentent_index, outcome in enumerate(outcomes[index]):
-      if outcome.lose > 0:
+    for oppentent_index, lose in enumerate(outcomes.lose[index]):
+      if lose > 0:
         print(f"      - {str(all_teams[oppentent_index]):s}")
 
   util.log("Searching for optimal strategy")
@@ -92,8 +97,7 @@ def try_all_round1():
 
   util.log("Retry search")
   outcomes = compare.round_robin(strong_teams)
-  print(numpy.matrix([[res.win - res.lose for res in row]
-                      for row in outcomes]))
+  print(numpy.matrix(outcomes.win - outcomes.lose))
   strategy = compare.gradient_decent(outcomes)
   for index in range(len(strong_teams)):
     print(f" {strategy[index]:4.0%}  {index:4d}  {str(strong_teams[index])}")
@@ -101,4 +105,6 @@ def try_all_round1():
 
   util.log("Done")
 
-try_all_round1()
+
+if __name__ == "__main__":
+  try_all_round1()
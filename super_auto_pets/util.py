@@ -9,17 +9,9 @@ def log(*messages):
 
 
 def argsort(xs, reverse=False, key=None):
-  sub_key = None
+  """Indexes of xs in the order that sorted(xs) would put them."""
   if key:
-    sub_key = lambda ix: key(ix[1])
-  return [i for i, x in sorted(enumerate(xs), reverse=reverse, key=sub_key)]
-
-
-def cartesian_product(vals, num):
-  """Yield all sequences of size num with values in vals as entries."""
-  if num == 0:
-    yield []
-    return
-  for seq in cartesian_product(vals, num - 1):
-    for val in vals:
-      yield [val] + seq
+    index_key = lambda i: key(xs[i])
+  else:
+    index_key = xs.__getitem__
+  return sorted(range(len(xs)), reverse=reverse, key=index_key)
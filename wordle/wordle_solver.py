@@ -1,7 +1,13 @@
 import collections
-import math
 import time
 
+import numpy as np
+try:
+  # Optional: Used to JIT compile feedback_matrix if available.
+  import numba
+except ImportError:
+  numba = None
+
 
 def load(type):
   words = set()
@@ -15,25 +21,45 @@ def load_dict():
 def load_answers():
   return load("answers")
 
+def load_words(type):
+  """Sorted list of words (for display) along with their word_codes() (for
+  computation)."""
+  words = sorted(load(type))
+  return words, word_codes(words)
+
 
 kBlank = 0
 kYellow = 1
 kGreen = 2
+# Feedback is encoded as a base 3 number with digit i (place value 3**i) being
+# the color for letter i of the guess. Ints are cheaper to build and hash than
+# tuples of colors.
+kPlace = [3**i for i in range(5)]
 def evaulate_guess(guess, answer):
-  ans_counts = collections.Counter(answer)
-  feedback = [kBlank for _ in range(len(answer))]
+  feedback = 0
+  # Letters of answer not matched by a Green (which are available for Yellows).
+  unmatched = []
   # Assign Greens
   for i in range(len(answer)):
     if guess[i] == answer[i]:
-      feedback[i] = kGreen
-      ans_counts[guess[i]] -= 1
+      feedback += kGreen * kPlace[i]
+    else:
+      unmatched.append(answer[i])
   # Assign Yellows
-  for i in range(len(answer)):
-    if feedback[i] == kBlank:
-      if ans_counts[guess[i]] > 0:
-        feedback[i] = kYellow
-        ans_counts[guess[i]] -= 1
-  return tuple(feedback)
+  if unmatched:
+    for i in range(len(answer)):
+      if guess[i] != answer[i] and guess[i] in unmatched:
+        feedback += kYellow * kPlace[i]
+        unmatched.remove(guess[i])
+  return feedback
+
+def feedback_colors(feedback, length=5):
+  """Decode feedback from evaulate_guess into a tuple of colors."""
+  colors = []
+  for _ in range(length):
+    feedback, color = divmod(feedback, 3)
+    colors.append(color)
+  return tuple(colors)
 
 # Top results:
 #   ORATE, ROATE, OATER : 1.7892
@@ -46,7 +72,7 @@ def first_word_max_colors(all_words, answers):
   for i, first_guess in enumerate(all_words):
     total_colors = 0
     for ans in answers:
-      feedback = evaulate_guess(first_guess, ans)
+      feedback = feedback_colors(evaulate_guess(first_guess, ans))
       # Weight all colors (Yellow or Green) equally in this function.
       num_color = sum(1 for color in feedback if color != kBlank)
       total_colors += num_color
@@ -64,27 +90,80 @@ def categorize_by_feedback(guess, answers):
     feedback_answers[feedback].add(answer)
   return feedback_answers
 
-def max_category(categories):
-  big_key = None
-  big_category = None
-  max_size = -1
-  for key, category in categories.items():
-    if len(category) > max_size:
-      big_key = key
-      big_category = category
-      max_size = len(big_category)
-  return big_key, big_category
-
-def min_category(categories):
-  small_key = None
-  small_category = None
-  min_size = math.inf
-  for key, category in categories.items():
-    if len(category) < min_size:
-      small_key = key
-      small_category = category
-      min_size = len(small_category)
-  return small_key, small_category
+def word_codes(words):
+  """Array of ASCII codes for list of words (which must all be the same length)."""
+  return np.frombuffer("".join(words).encode("ascii"),
+                       dtype=np.uint8).reshape(len(words), -1)
+
+def _feedback_matrix(guess_codes, answer_codes):
+  """evaulate_guess() for all pairs of words (given by word_codes())."""
+  feedback = np.zeros((len(guess_codes), len(answer_codes)), dtype=np.uint8)
+  # Count of each letter in answer not matched by a Green (indexed by code).
+  unmatched = np.zeros(256, dtype=np.int64)
+  for g in range(len(guess_codes)):
+    guess = guess_codes[g]
+    for a in range(len(answer_codes)):
+      answer = answer_codes[a]
+      code = 0
+      # Assign Greens
+      place = 1
+      for i in range(len(answer)):
+        if guess[i] == answer[i]:
+          code += kGreen * place
+        else:
+          unmatched[answer[i]] += 1
+        place *= 3
+      # Assign Yellows
+      place = 1
+      for i in range(len(answer)):
+        if guess[i] != answer[i] and unmatched[guess[i]] > 0:
+          code += kYellow * place
+          unmatched[guess[i]] -= 1
+        place *= 3
+      for i in range(len(answer)):
+        unmatched[answer[i]] = 0
+      feedback[g, a] = code
+  return feedback
+
+if numba:
+  _feedback_matrix = numba.njit(cache=True)(_feedback_matrix)
+
+def _feedback_matrix_vectorized(guess_codes, answer_codes, chunk_size=256):
+  """Same as _feedback_matrix, but vectorized with NumPy (comparing letters
+  of a chunk of guesses against all answers at once)."""
+  num_letters = guess_codes.shape[1]
+  # answers[k] = letter k of all answers (broadcast against chunk of guesses).
+  answers = answer_codes.T[:, None, :]
+  feedback = np.empty((len(guess_codes), len(answer_codes)), dtype=np.uint8)
+  for start in range(0, len(guess_codes), chunk_size):
+    # guesses[:, i] = letter i of guesses in this chunk.
+    guesses = guess_codes[start:start + chunk_size, :, None]
+    unmatched = [guesses[:, i] != answers[i] for i in range(num_letters)]
+    code = np.zeros((len(guesses), len(answer_codes)), dtype=np.uint8)
+    place = 1
+    for i in range(num_letters):
+      # Number of copies of guess[i] in answer not matched by a Green or
+      # used for a Yellow by an earlier copy in guess.
+      avail = np.zeros(code.shape, dtype=np.int8)
+      for k in range(num_letters):
+        avail += (guesses[:, i] == answers[k]) & unmatched[k]
+      for j in range(i):
+        avail -= (guesses[:, j] == guesses[:, i]) & unmatched[j]
+      color = np.where(unmatched[i], kYellow * (avail > 0), kGreen)
+      code += color.astype(np.uint8) * place
+      place *= 3
+    feedback[start:start + chunk_size] = code
+  return feedback
+
+def feedback_matrix(guess_codes, answer_codes):
+  """feedback[g, a] = evaulate_guess(guess g, answer a) for word_codes() of
+  guesses and answers.
+
+  Computed once, since the same pairs are evaluated over and over again
+  while searching. Stored as uint8 since there are only 3**5 = 243 feedbacks."""
+  if numba:
+    return _feedback_matrix(guess_codes, answer_codes)
+  return _feedback_matrix_vectorized(guess_codes, answer_codes)
 
 # Top results:
 #   AESIR, REAIS, SERAI : 168
@@ -93,32 +172,53 @@ def min_category(categories):
 #   ALOES               : 174
 #   REALO               : 176
 #   STOAE               : 177
-def max_categories(all_words, answers):
-  biggest_categories = {}
+def max_categories(all_words, all_codes, answer_codes, feedback, answer_indexes):
+  """Size of biggest category (answers with the same feedback) for each guess
+  when the answer is one of answer_indexes."""
+  # Guesses which share no letters with any remaining answer get all Blank
+  # feedback, so have a single category with all answers. Don't bother
+  # categorizing for them.
+  letters = np.zeros(256, dtype=bool)
+  letters[answer_codes[answer_indexes]] = True
+  useful = letters[all_codes].any(axis=1)
+  sizes = np.full(len(all_words), len(answer_indexes), dtype=np.int64)
   for i, guess in enumerate(all_words):
-    feedback_answers = categorize_by_feedback(guess, answers)
-    biggest_categories[guess] = max_category(feedback_answers)
+    if useful[i]:
+      sizes[i] = np.bincount(feedback[i, answer_indexes]).max()
+      if sizes[i] == 1:
+        # No guess can do better than this (and min_max_categories picks the
+        # first best guess anyway).
+        break
     if i % 1000 == 0:
-      print(" ...", i, guess, len(biggest_categories[guess]), time.process_time())
-  return biggest_categories
+      print(" ...", i, guess, sizes[i], time.process_time())
+  return sizes
 
-def min_max_categories(all_words, answers):
-  big_categories = max_categories(all_words, answers)
-  best_guess, category = min_category({guess: cat for (guess, (_, cat)) in big_categories.items()})
-  return best_guess, big_categories[best_guess][0], category
+def min_max_categories(all_words, all_codes, answer_codes, feedback,
+                       answer_indexes):
+  """Find guess whose biggest category is smallest.
+  Returns (guess index, feedback, answer indexes) for that category."""
+  best_guess = max_categories(all_words, all_codes, answer_codes, feedback,
+                              answer_indexes).argmin()
+  responses = feedback[best_guess, answer_indexes]
+  counts = np.bincount(responses)
+  # If there are ties, use the category containing the earliest answer.
+  worst_response = int(responses[(counts[responses] == counts.max()).argmax()])
+  return (best_guess, worst_response,
+          answer_indexes[responses == worst_response])
 
-def iterate_min_max_categories(all_words, answers):
-  remaining_answers = answers
+def iterate_min_max_categories(all_words, all_codes, answer_codes, feedback):
+  remaining_answers = np.arange(len(answer_codes))
   while len(remaining_answers) > 1:
-    optimal_guess, worst_response, category = min_max_categories(all_words, remaining_answers)
-    print(f"{optimal_guess:10s} {worst_response} {len(category):6_d}")
-    remaining_answers = category
+    optimal_guess, worst_response, remaining_answers = min_max_categories(
+      all_words, all_codes, answer_codes, feedback, remaining_answers)
+    print(f"{all_words[optimal_guess]:10s} {feedback_colors(worst_response)} {len(remaining_answers):6_d}")
 
 
 # A coule tests
-#print(evaulate_guess("yabbe", "abbey"))
-all_words = load_dict()
-answers = load_answers()
+#print(feedback_colors(evaulate_guess("yabbe", "abbey")))
+all_words, all_codes = load_words("accepted")
+answers, answer_codes = load_words("answers")
+feedback = feedback_matrix(all_codes, answer_codes)
 #first_word_max_colors(all_words, answers)
-#min_max_categories(all_words, answers)
-iterate_min_max_categories(all_words, answers)
+#min_max_categories(all_words, all_codes, answer_codes, feedback, np.arange(len(answers)))
+iterate_min_max_categories(all_words, all_codes, answer_codes, feedback)